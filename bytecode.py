@@ -0,0 +1,449 @@
+import cmath
+import inspect
+import json
+from array import array
+from lexical_analysis import Lexeme
+from postfix_transformation import PostfixMark, PostfixJump, operator_functions, temporary_prefix, is_source_constant, \
+    value_error_messages, value_errors
+from syntax_analysis import TerminalMatch
+
+opcode_names = [
+    'push_constant',
+    'push_name',
+    'store',
+    'read',
+    'write',
+    'write_constant',
+    'write_name',
+    'jump',
+    'jump_if_false',
+    'negate',
+    'positive',
+    'add',
+    'subtract',
+    'multiply',
+    'divide',
+    'power',
+    'equal',
+    'not_equal',
+    'greater',
+    'less',
+    'greater_equal',
+    'less_equal',
+]
+
+opcodes = {name: number for number, name in enumerate(opcode_names)}
+
+operator_opcodes = {
+    '@': opcodes['negate'],
+    '+_': opcodes['positive'],
+    '+': opcodes['add'],
+    '-': opcodes['subtract'],
+    '*': opcodes['multiply'],
+    '/': opcodes['divide'],
+    '^': opcodes['power'],
+    '==': opcodes['equal'],
+    '!=': opcodes['not_equal'],
+    '<>': opcodes['not_equal'],
+    '>': opcodes['greater'],
+    '<': opcodes['less'],
+    '>=': opcodes['greater_equal'],
+    '<=': opcodes['less_equal'],
+}
+
+opcode_texts = {opcode: text for text, opcode in reversed(list(operator_opcodes.items()))}
+opcode_texts.update({
+    opcodes['store']: '=',
+    opcodes['read']: 'read',
+    opcodes['write']: 'write',
+    opcodes['write_constant']: 'write',
+    opcodes['write_name']: 'write',
+})
+
+jump_opcodes = {opcodes['jump'], opcodes['jump_if_false']}
+
+name_opcodes = {opcodes['push_name'], opcodes['write_name'], opcodes['store'], opcodes['read']}
+
+binary_functions = {operator_opcodes[text]: function for text, function in operator_functions.items()}
+
+_binary_opcode = len(opcode_names)
+
+json_constant_types = {'float': float, 'complex': complex}
+
+
+def get_json_constant(value):
+    if isinstance(value, complex) or isinstance(value, float) and not cmath.isfinite(value):
+        return {type(value).__name__: repr(value)}
+    return value
+
+
+def get_constant_from_json(value):
+    if isinstance(value, dict):
+        (type_name, text), = value.items()
+        return json_constant_types[type_name](text)
+    return value
+
+
+class ExecutionError(Exception):
+    def __init__(self, error_type, lexeme, message):
+        super(ExecutionError, self).__init__('%s: %s %s' % (error_type, message, lexeme.text))
+        self.error_type = error_type
+        self.lexeme = lexeme
+        self.message = message
+
+
+class BytecodeProgram(object):
+    def __init__(self):
+        self.code = array('i')
+        self.lines = array('I')
+        self.columns = array('I')
+        self.constants = []
+        self.constant_texts = []
+        self.names = []
+        self._constant_indexes = dict()
+        self._name_indexes = dict()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def add_instruction(self, opcode, argument=0, lexeme=None):
+        self.code.append(opcode)
+        self.code.append(argument)
+        self.lines.append(lexeme.line if lexeme else 0)
+        self.columns.append(lexeme.column if lexeme else 0)
+        return len(self.lines) - 1
+
+    def get_instruction(self, offset):
+        return self.code[2 * offset], self.code[2 * offset + 1]
+
+    def set_instruction(self, offset, opcode, argument):
+        self.code[2 * offset] = opcode
+        self.code[2 * offset + 1] = argument
+
+    def add_constant(self, text, value):
+        if text not in self._constant_indexes:
+            self._constant_indexes[text] = len(self.constants)
+            self.constants.append(value)
+            self.constant_texts.append(text)
+        return self._constant_indexes[text]
+
+    def add_name(self, name):
+        if name not in self._name_indexes:
+            self._name_indexes[name] = len(self.names)
+            self.names.append(name)
+        return self._name_indexes[name]
+
+    def get_lexeme(self, offset):
+        opcode, argument = self.get_instruction(offset)
+        if opcode in (opcodes['push_constant'], opcodes['write_constant']):
+            text, lex_type = self.constant_texts[argument], 'constant'
+        elif opcode in (opcodes['push_name'], opcodes['write_name']):
+            text, lex_type = self.names[argument], 'identifier'
+        else:
+            text, lex_type = opcode_texts.get(opcode, opcode_names[opcode]), 'terminal'
+        return Lexeme(text, lex_type, (self.lines[offset], self.columns[offset]), None)
+
+    def to_bytes(self):
+        header = json.dumps({
+            'instructions': len(self),
+            'constants': [get_json_constant(value) for value in self.constants],
+            'constant_texts': self.constant_texts,
+            'names': self.names,
+        }, allow_nan=False).encode('utf-8')
+        return b''.join([array('I', [len(header)]).tobytes(), header,
+                         self.code.tobytes(), self.lines.tobytes(), self.columns.tobytes()])
+
+    @staticmethod
+    def from_bytes(data):
+        header_size = array('I', data[:array('I').itemsize])[0]
+        position = array('I').itemsize
+        header = json.loads(data[position:position + header_size].decode('utf-8'))
+        position += header_size
+        program = BytecodeProgram()
+        for name, column in [('code', program.code), ('lines', program.lines), ('columns', program.columns)]:
+            size = header['instructions'] * column.itemsize * (2 if name == 'code' else 1)
+            column.frombytes(data[position:position + size])
+            position += size
+        for text, value in zip(header['constant_texts'], header['constants']):
+            program.add_constant(text, get_constant_from_json(value))
+        for name in header['names']:
+            program.add_name(name)
+        return program
+
+
+def get_assignment_targets(postfix_ordered):
+    targets = dict()
+    operands = []
+    for position, element in enumerate(postfix_ordered):
+        if type(element) == PostfixMark:
+            continue
+        if type(element) == PostfixJump:
+            arity = 1 if element.name == 'jump_on_False' else 0
+        elif element.symbol.name in ('constant', 'identifier'):
+            operands.append(position)
+            continue
+        elif element.symbol.name in ('write', 'read') or element.lexeme.text in ('@', '+_'):
+            arity = 1
+        else:
+            arity = 2
+        if len(operands) < arity:
+            raise ValueError('Postfix element %s lacks operands' % element)
+        popped = operands[len(operands) - arity:]
+        del operands[len(operands) - arity:]
+        if type(element) == PostfixJump or element.symbol.name == 'write':
+            continue
+        if element.symbol.name in ('assignment_operator', 'read'):
+            if postfix_ordered[popped[0]].symbol.name != 'identifier':
+                raise ValueError('Postfix element %s does not assign an identifier' % element)
+            targets[position] = popped[0]
+        else:
+            operands.append(position)
+    return targets
+
+
+class BytecodeGenerator(object):
+    def get_program(self, postfix_ordered):
+        program = BytecodeProgram()
+        targets = get_assignment_targets(postfix_ordered)
+        target_positions = set(targets.values())
+        offsets = []
+        jumps = []
+        for position, element in enumerate(postfix_ordered):
+            offsets.append(len(program))
+            if type(element) == PostfixMark:
+                continue
+            if type(element) == PostfixJump:
+                opcode = opcodes['jump'] if element.name == 'jump' else opcodes['jump_if_false']
+                jumps.append((program.add_instruction(opcode), element.mark))
+                continue
+            if position in target_positions:
+                program.add_name(element.lexeme.text)
+                continue
+            target = postfix_ordered[targets[position]] if position in targets else None
+            self._add_match(program, postfix_ordered, position, element, target)
+        offsets.append(len(program))
+        for offset, mark in jumps:
+            if mark.start_position is None:
+                raise ValueError('Mark %s has no position' % mark)
+            opcode, _ = program.get_instruction(offset)
+            program.set_instruction(offset, opcode, offsets[mark.start_position])
+        return program
+
+    @staticmethod
+    def _add_match(program, postfix_ordered, position, match, target):
+        lexeme = match.lexeme
+        name = match.symbol.name
+        if name == 'constant':
+            program.add_instruction(opcodes['push_constant'], program.add_constant(lexeme.text, lexeme.value), lexeme)
+        elif name == 'identifier':
+            program.add_instruction(opcodes['push_name'], program.add_name(lexeme.text), lexeme)
+        elif name == 'write':
+            previous_match = postfix_ordered[position - 1]
+            previous_name = previous_match.symbol.name if type(previous_match) == TerminalMatch else None
+            if previous_name == 'identifier' or previous_name == 'constant' and is_source_constant(previous_match):
+                opcode, argument = program.get_instruction(len(program) - 1)
+                fused_opcode = 'write_constant' if previous_name == 'constant' else 'write_name'
+                program.set_instruction(len(program) - 1, opcodes[fused_opcode], argument)
+            else:
+                program.add_instruction(opcodes['write'], 0, lexeme)
+        elif name == 'read':
+            program.add_instruction(opcodes['read'], program.add_name(target.lexeme.text), lexeme)
+        elif name == 'assignment_operator':
+            program.add_instruction(opcodes['store'], program.add_name(target.lexeme.text), lexeme)
+        elif lexeme.text in operator_opcodes:
+            program.add_instruction(operator_opcodes[lexeme.text], 0, lexeme)
+        else:
+            raise ValueError('Unknown postfix element: %s' % match)
+
+
+def disassemble(program):
+    table = [['offset', 'opcode', 'argument', 'operand', 'location']]
+    targets = sorted({argument for opcode, argument in
+                      (program.get_instruction(offset) for offset in range(len(program)))
+                      if opcode in jump_opcodes})
+    labels = {target: 'label_%s' % i for i, target in enumerate(targets)}
+    for offset in range(len(program)):
+        opcode, argument = program.get_instruction(offset)
+        if opcode in (opcodes['push_constant'], opcodes['write_constant']):
+            operand = program.constant_texts[argument]
+        elif opcode in name_opcodes:
+            operand = program.names[argument]
+        elif opcode in jump_opcodes:
+            operand = labels[argument]
+        else:
+            operand = ''
+        opcode_name = opcode_names[opcode]
+        if offset in labels:
+            opcode_name = '%s: %s' % (labels[offset], opcode_name)
+        table.append([offset, opcode_name, argument, operand,
+                      '%s:%s' % (program.lines[offset], program.columns[offset])])
+    if len(program) in labels:
+        table.append([len(program), '%s: end' % labels[len(program)], '', '', ''])
+    return table
+
+
+class ResumableExecutor(object):
+    def __init__(self):
+        self.variables = dict()
+        self.program = None
+        self._steps = None
+
+    def run(self, program, output_function=None):
+        raise NotImplementedError
+
+    def get_output(self, program, output_function=None, value=None, start_position=0):
+        try:
+            if value is None:
+                if self._steps is not None:
+                    self._steps.close()
+                self._steps = self.run(program, output_function)
+                request = next(self._steps)
+            else:
+                request = self._steps.send(value)
+        except StopIteration:
+            self._steps = None
+            return True
+        output_function(mode='input', next_compiler_position=request[1])
+        return False
+
+    def get_read_lexeme(self, program, position):
+        raise NotImplementedError
+
+    def _throw_input_error(self, steps, program, position, error):
+        message = 'No input value' if isinstance(error, EOFError) else 'Invalid input value'
+        steps.throw(ExecutionError('Input Error', self.get_read_lexeme(program, position), message))
+
+    def get_output_with_input(self, program, output_function, input_function):
+        steps = self.run(program, output_function)
+        try:
+            request = next(steps)
+            while True:
+                try:
+                    value = input_function(request[1])
+                except (EOFError, ValueError) as error:
+                    self._throw_input_error(steps, program, request[1], error)
+                request = steps.send(value)
+        except StopIteration:
+            return True
+        finally:
+            steps.close()
+
+    async def get_output_async(self, program, output_function, input_function):
+        steps = self.run(program, output_function)
+        try:
+            request = next(steps)
+            while True:
+                try:
+                    value = input_function(request[1])
+                    if inspect.isawaitable(value):
+                        value = await value
+                except (EOFError, ValueError) as error:
+                    self._throw_input_error(steps, program, request[1], error)
+                request = steps.send(value)
+        except StopIteration:
+            return True
+        finally:
+            steps.close()
+
+
+class BytecodeExecutor(ResumableExecutor):
+    def __init__(self):
+        super(BytecodeExecutor, self).__init__()
+        self.slots = list()
+
+    def get_read_lexeme(self, program, position):
+        return program.get_lexeme(position - 1)
+
+    @staticmethod
+    def _link(program):
+        code = []
+        for offset in range(len(program)):
+            opcode, argument = program.get_instruction(offset)
+            if opcode in binary_functions:
+                code.append((_binary_opcode, binary_functions[opcode]))
+            else:
+                code.append((opcode, argument))
+        return code
+
+    def _load_slots(self, program):
+        return [None if name.startswith(temporary_prefix) else self.variables.get(name) for name in program.names]
+
+    def _store_slots(self, program, slots):
+        for name, value in zip(program.names, slots):
+            if value is not None and not name.startswith(temporary_prefix):
+                self.variables[name] = value
+
+    @staticmethod
+    def _undeclared(program, offset):
+        return ExecutionError('Name Error', program.get_lexeme(offset), 'Undeclared identifier')
+
+    def run(self, program, output_function=None):
+        self.program = program
+        code = self._link(program)
+        slots = self.slots = self._load_slots(program)
+        try:
+            yield from self._run(program, code, slots, output_function)
+        finally:
+            self._store_slots(program, slots)
+
+    def _run(self, program, code, slots, output_function):
+        offset = 0
+        length = len(code)
+        constants = program.constants
+        constant_texts = program.constant_texts
+        stack = []
+        push_constant = opcodes['push_constant']
+        push_name = opcodes['push_name']
+        binary = _binary_opcode
+        store = opcodes['store']
+        jump = opcodes['jump']
+        jump_if_false = opcodes['jump_if_false']
+        negate = opcodes['negate']
+        positive = opcodes['positive']
+        write = opcodes['write']
+        write_constant = opcodes['write_constant']
+        read = opcodes['read']
+        try:
+            while offset < length:
+                opcode, argument = code[offset]
+                offset += 1
+                if opcode == push_name:
+                    value = slots[argument]
+                    if value is None:
+                        raise self._undeclared(program, offset - 1)
+                    stack.append(value)
+                elif opcode == push_constant:
+                    stack.append(constants[argument])
+                elif opcode == binary:
+                    b = stack.pop()
+                    stack[-1] = argument(stack[-1], b)
+                elif opcode == store:
+                    slots[argument] = stack.pop()
+                elif opcode == jump_if_false:
+                    if not stack.pop():
+                        offset = argument
+                elif opcode == jump:
+                    offset = argument
+                elif opcode == negate:
+                    stack[-1] = -stack[-1]
+                elif opcode == positive:
+                    pass
+                elif opcode == read:
+                    self._store_slots(program, slots)
+                    slots[argument] = yield 'input', offset
+                else:
+                    if opcode == write:
+                        value = stack.pop()
+                    elif opcode == write_constant:
+                        value = constant_texts[argument]
+                    else:
+                        value = slots[argument]
+                        if value is None:
+                            raise self._undeclared(program, offset - 1)
+                    self._store_slots(program, slots)
+                    if output_function is None:
+                        yield 'output', value
+                    else:
+                        output_function(value)
+        except value_errors as error:
+            raise ExecutionError('Value Error', program.get_lexeme(offset - 1), value_error_messages[type(error)])
@@ -2,3 +2,41 @@ type_regexes = {
     'constant': '(\d+\.?\d*)|(\.\d+)',
     'identifier': '[_a-zA-Z0-9]*$',
 }
+
+special_substrings = {
+    ';',
+    '(',
+    ')',
+    '==',
+    '!=',
+    '>=',
+    '<=',
+    '>',
+    '<',
+    '+',
+    '-',
+    '*',
+    '/',
+    '=',
+    '{',
+    '}',
+    '^'
+}
+
+keywords = {
+    'if',
+    'then',
+    'else',
+    'while',
+    'do',
+    'enddo',
+    'write',
+    'read'
+}
+
+terminal_lexemes = {name: i for i, name in enumerate(reversed(sorted(keywords | special_substrings)))}
+
+type_terminal_numbers = {
+    'identifier': len(terminal_lexemes),
+    'constant': len(terminal_lexemes) + 1,
+}
@@ -1,23 +1,50 @@
-from lexical_analysis import LexicalAnalyzer, AnalysisError, Lexeme
-from postfix_transformation import PostfixProcessor, PostfixExecutor
+from lexical_analysis import LexicalAnalyzer, IncrementalLexicalAnalyzer, AnalysisError, Lexeme
+from postfix_transformation import PostfixProcessor, SyntaxDirectedTranslator
 from syntax_analysis import SyntaxAnalyzer
-from file_wrapper import CSVWrapper
+from postfix_optimization import PostfixOptimizer
+from bytecode import BytecodeGenerator, BytecodeExecutor, ExecutionError, disassemble
+from python_backend import PythonGenerator, PythonExecutor
+from file_wrapper import FileWrapper, CSVWrapper
 
 
 class Compiler(object):
-    def __init__(self, root='statement_list'):
-        self.lexical_analyzer = LexicalAnalyzer()
-        self.syntax_analyzer = SyntaxAnalyzer()
-        self.syntax_analyzer.set_root(root)
+    def __init__(self, root='statement_list', incremental=False, processes=None, syntax_analyzer=None,
+                 trace_postfix_history=False, optimize=True, backend='bytecode', input_provider=None):
+        if incremental and processes:
+            raise ValueError('Incremental lexical analysis cannot be combined with processes')
+        self.root = root
+        self.backend = backend
+        self.input_provider = input_provider
+        self.trace_postfix_history = trace_postfix_history
+        self.incremental = incremental
+        self.lexical_analyzer = LexicalAnalyzer(processes=processes)
+        self._incremental_analyzers = dict()
+        if syntax_analyzer is None:
+            syntax_analyzer = SyntaxAnalyzer(engine='stack', lookahead=True, arena=True)
+        self.syntax_analyzer = syntax_analyzer
         self.postfix_transformer = PostfixProcessor()
-        self.executor = PostfixExecutor()
+        self.translator = SyntaxDirectedTranslator(self.syntax_analyzer)
+        self.optimizer = PostfixOptimizer(enabled=optimize)
+        self.bytecode_generator = BytecodeGenerator()
+        self.python_generator = PythonGenerator()
+        if backend == 'python':
+            self.executor = PythonExecutor()
+        else:
+            self.executor = BytecodeExecutor()
 
     @property
     def variables(self):
         return self.executor.variables
 
+    def _get_lexical_analyzer(self, file):
+        if not self.incremental:
+            return self.lexical_analyzer
+        if file.file_path not in self._incremental_analyzers:
+            self._incremental_analyzers[file.file_path] = IncrementalLexicalAnalyzer()
+        return self._incremental_analyzers[file.file_path]
+
     def get_lexemes(self, file, output_function, output_status=False):
-        lexemes, error_log = self.lexical_analyzer.analyze(file)
+        lexemes, error_log = self._get_lexical_analyzer(file).analyze(file)
         if not error_log:
             if output_status:
                 output_function("Lexical analysis completed successfully")
@@ -29,51 +56,136 @@ class Compiler(object):
     def get_match(self, file, output_function, output_status=False):
         lexemes = self.get_lexemes(file, output_function, output_status)
         if lexemes:
-            result = self.syntax_analyzer.get_match(lexemes)
-            if isinstance(result, Lexeme):
-                if result.text == '=':
-                    error = AnalysisError(file=file,
-                                          error_type="Syntax Error",
-                                          lexeme=result,
-                                          message="Wrong structure in assignment statement after symbol:")
-                else:
-                    error = AnalysisError(file=file,
-                                          error_type="Syntax Error",
-                                          lexeme=result,
-                                          message="Wrong structure! Unexpected symbol:")
-                output_function('\n' + str(error))
-                return None
-            elif result is None:
+            return self._get_match_for_lexemes(file, lexemes, output_function, output_status)
+
+    def _get_match_for_lexemes(self, file, lexemes, output_function, output_status=False):
+        result = self.syntax_analyzer.get_match(lexemes, self.root)
+        if isinstance(result, Lexeme):
+            if result.text == '=':
                 error = AnalysisError(file=file,
                                       error_type="Syntax Error",
-                                      lexeme=lexemes[-1],
-                                      message="Unexpected end of the program after ")
-                output_function('\n' + str(error))
-                return None
-            elif output_status:
-                output_function("Syntax analysis completed successfully")
-            return result
+                                      lexeme=result,
+                                      message="Wrong structure in assignment statement after symbol:")
+            else:
+                error = AnalysisError(file=file,
+                                      error_type="Syntax Error",
+                                      lexeme=result,
+                                      message="Wrong structure! Unexpected symbol:")
+            output_function('\n' + str(error))
+            return None
+        elif result is None:
+            error = AnalysisError(file=file,
+                                  error_type="Syntax Error",
+                                  lexeme=lexemes[-1],
+                                  message="Unexpected end of the program after ")
+            output_function('\n' + str(error))
+            return None
+        elif output_status:
+            output_function("Syntax analysis completed successfully")
+        return result
 
     def get_postfix(self, file, output_function, output_status=False):
         match = self.get_match(file, output_function)
         if match:
             terminal_matches = match.get_terminal_matches()
-            postfix, marks, postfix_history = self.postfix_transformer.get_postfix_matches(terminal_matches)
-            marks_table = [['mark name', 'position']]
-            for mark, position in marks.items():
-                marks_table.append([str(mark), position])
-            CSVWrapper.write_csv(file.postfix_history_path, postfix_history)
-            CSVWrapper.write_csv(file.postfix_marks_path, marks_table)
+            if output_status or self.trace_postfix_history:
+                with CSVWrapper.open_csv_writer(file.postfix_history_path) as history_writer:
+                    postfix, marks, _ = self.postfix_transformer.get_postfix_matches(terminal_matches,
+                                                                                     history_writer)
+            else:
+                postfix, marks, _ = self.postfix_transformer.get_postfix_matches(terminal_matches)
+            self._write_marks(file, marks)
             if output_status:
                 output_function(', '.join([str(element) for element in postfix]))
                 output_function('\n' + CSVWrapper.read_csv(file.postfix_marks_path))
             else:
                 return postfix
 
+    @staticmethod
+    def _write_marks(file, marks):
+        marks_table = [['mark name', 'position']]
+        for mark, position in marks.items():
+            marks_table.append([str(mark), position])
+        CSVWrapper.write_csv(file.postfix_marks_path, marks_table)
+
+    def get_translation(self, file, output_function):
+        lexemes = self.get_lexemes(file, output_function)
+        if lexemes:
+            postfix, marks = self.translator.get_postfix_matches(lexemes)
+            if postfix is None:
+                self._get_match_for_lexemes(file, lexemes, output_function)
+                return None
+            postfix, marks, report = self.optimizer.optimize(postfix, marks)
+            CSVWrapper.write_csv(file.optimization_path, report)
+            self._write_marks(file, marks)
+            return postfix
+
+    def get_bytecode(self, file, output_function, output_status=False):
+        postfix = self.get_translation(file, output_function)
+        if postfix:
+            program = self.bytecode_generator.get_program(postfix)
+            CSVWrapper.write_csv(file.bytecode_path, disassemble(program))
+            if output_status:
+                output_function(CSVWrapper.read_csv(file.bytecode_path))
+            return program
+
+    def get_python(self, file, output_function, output_status=False):
+        postfix = self.get_translation(file, output_function)
+        if postfix:
+            program = self.python_generator.get_program(postfix)
+            FileWrapper.write_file(file.python_path, program.get_module())
+            if output_status:
+                output_function(FileWrapper.read_file(file.python_path))
+            return program
+
+    def _get_program(self, file, output_function):
+        if self.root == 'statement_list':
+            if self.backend == 'python':
+                return self.get_python(file, output_function)
+            return self.get_bytecode(file, output_function)
+        postfix = self.get_postfix(file, output_function)
+        if postfix:
+            if self.backend == 'python':
+                return self.python_generator.get_program(postfix)
+            return self.bytecode_generator.get_program(postfix)
+
+    def _write_variables(self, file):
+        variables_table = [['variable', 'value']]
+        for variable, value in self.variables.items():
+            variables_table.append([variable, value])
+        CSVWrapper.write_csv(file.variables_path, variables_table)
+
     def get_output(self, file, output_function, value, start_position):
-        if not(value is None):
-            self.executor.get_output(self.executor.postfix, file, output_function, value, start_position)
+        if value is None:
+            program = self._get_program(file, output_function)
+            if program is None:
+                return
         else:
-            postfix = self.get_postfix(file, output_function)
-            if postfix:
-                self.executor.get_output(postfix, file, output_function)
+            program = self.executor.program
+        try:
+            if self.input_provider is not None:
+                finished = self.executor.get_output_with_input(program, output_function, self.input_provider.get_value)
+            else:
+                finished = self.executor.get_output(program, output_function, value, start_position)
+        except ExecutionError as error:
+            self._output_execution_error(file, error, output_function)
+            finished = True
+        if finished:
+            self._write_variables(file)
+
+    async def get_output_async(self, file, output_function, input_function):
+        program = self._get_program(file, output_function)
+        if program is None:
+            return
+        try:
+            await self.executor.get_output_async(program, output_function, input_function)
+        except ExecutionError as error:
+            self._output_execution_error(file, error, output_function)
+        self._write_variables(file)
+
+    @staticmethod
+    def _output_execution_error(file, error, output_function):
+        output_function('\n' + str(AnalysisError(file=file,
+                                                 error_type=error.error_type,
+                                                 lexeme=error.lexeme,
+                                                 message=error.message)))
@@ -281,6 +281,10 @@ class MenuBar(Frame):
                                    command=lambda: self.mainframe.show_table("postfix_history"))
         self.view_menu.add_command(label="Show Table of Posfix Marks",
                                    command=lambda: self.mainframe.show_table("postfix_marks"))
+        self.view_menu.add_command(label="Show Table of Bytecode",
+                                   command=lambda: self.mainframe.show_table("bytecode"))
+        self.view_menu.add_command(label="Show Table of Optimization",
+                                   command=lambda: self.mainframe.show_table("optimization"))
         self.view_menu.add_command(label="Show Variables",
                                    command=lambda: self.mainframe.show_table("variables"))
 
@@ -291,6 +295,10 @@ class MenuBar(Frame):
                                     command=lambda: self.tool_bar.lexical_and_syntax_analysis())
         self.tools_menu.add_command(label="Postfix Notation",
                                     command=lambda: self.tool_bar.postfix())
+        self.tools_menu.add_command(label="Bytecode",
+                                    command=lambda: self.tool_bar.bytecode())
+        self.tools_menu.add_command(label="Python Module",
+                                    command=lambda: self.tool_bar.python())
         self.tools_menu.add_command(label="Run                        Ctrl+B",
                                     command=lambda: self.tool_bar.run(True))
 
@@ -333,7 +341,7 @@ class ToolBar(Frame):
         self.button_syn.pack(side="left")
         self.button_pfix.pack(side="left")
         self.button_run.pack(side="left")
-        self.compiler = Compiler()
+        self.compiler = Compiler(incremental=True)
 
     @property
     def console(self):
@@ -384,6 +392,18 @@ class ToolBar(Frame):
             self.console.clear()
             self.compiler.get_postfix(file, self.console.print_text, output_status=True)
 
+    def bytecode(self):
+        file = self.get_file()
+        if file:
+            self.console.clear()
+            self.compiler.get_bytecode(file, self.console.print_text, output_status=True)
+
+    def python(self):
+        file = self.get_file()
+        if file:
+            self.console.clear()
+            self.compiler.get_python(file, self.console.print_text, output_status=True)
+
     def run(self, _, value=None, start_position=0):
         file = self.get_file()
         if file:
@@ -582,7 +602,7 @@ class NotebookTab(ScrolledText):
             TableWindow(table_type, file_path).mainloop()
         elif table_type in ['lexemes', 'identifiers', 'constants']:
             showerror("Error", "Lexical analysis for {} does not exist.".format(self.file.filename))
-        elif table_type in ['postfix_history', 'postfix_marks']:
+        elif table_type in ['postfix_history', 'postfix_marks', 'bytecode', 'optimization']:
             showerror("Error", "Postfix notation for {} does not exist.".format(self.file.filename))
         elif table_type == 'variables':
             showerror("Error", "First run the programme!")
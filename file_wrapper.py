@@ -1,4 +1,6 @@
 import csv
+from contextlib import contextmanager
+from itertools import islice
 
 
 class FileWrapper(object):
@@ -16,6 +18,24 @@ class FileWrapper(object):
     def rows(self):
         return self.text.split('\n')
 
+    def iter_rows(self, chunk_size=1 << 16):
+        if self.file_path == "Untitled":
+            yield ""
+            return
+        with open(self.file_path, 'r') as openfile:
+            tail = ""
+            while True:
+                chunk = openfile.read(chunk_size)
+                if not chunk:
+                    break
+                rows = (tail + chunk).split('\n')
+                tail = rows.pop()
+                yield from rows
+            yield tail
+
+    def get_row(self, row_number):
+        return next(islice(self.iter_rows(), row_number, None), "")
+
     @property
     def filename(self):
         return self.file_path.split('/')[-1]
@@ -40,6 +60,18 @@ class FileWrapper(object):
     def postfix_marks_path(self):
         return "".join(self.file_path.split('.')[:-1]) + "_marks.csv"
 
+    @property
+    def bytecode_path(self):
+        return "".join(self.file_path.split('.')[:-1]) + "_bytecode.csv"
+
+    @property
+    def optimization_path(self):
+        return "".join(self.file_path.split('.')[:-1]) + "_optimization.csv"
+
+    @property
+    def python_path(self):
+        return "".join(self.file_path.split('.')[:-1]) + "_program.py"
+
     @property
     def variables_path(self):
         return "".join(self.file_path.split('.')[:-1]) + "_variables.csv"
@@ -71,11 +103,16 @@ class CSVWrapper(object):
 
     @staticmethod
     def write_csv(file_path, row_list):
-        with open(file_path, 'w', newline='') as output_file:
-            writer = csv.writer(output_file)
+        with CSVWrapper.open_csv_writer(file_path) as writer:
             for row in row_list:
                 writer.writerow(row)
 
+    @staticmethod
+    @contextmanager
+    def open_csv_writer(file_path):
+        with open(file_path, 'w', newline='') as output_file:
+            yield csv.writer(output_file)
+
     @staticmethod
     def _get_table_view(row_list):
         columns_lengths = CSVWrapper._get_columns_lengths(row_list)
@@ -0,0 +1,70 @@
+import sys
+
+
+class InputProvider(object):
+    def get_value(self, position=None):
+        raise NotImplementedError
+
+
+class ListInputProvider(InputProvider):
+    def __init__(self, values):
+        self.values = [float(value) for value in values]
+        self._index = 0
+
+    def get_value(self, position=None):
+        if self._index >= len(self.values):
+            raise EOFError('No more input values')
+        self._index += 1
+        return self.values[self._index - 1]
+
+
+class StreamInputProvider(InputProvider):
+    def __init__(self, stream, buffer_size=1 << 16):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._values = []
+        self._index = 0
+        self._tail = ''
+
+    def _read_values(self):
+        while True:
+            chunk = self.stream.read(self.buffer_size)
+            text = self._tail + chunk.replace(',', ' ')
+            parts = text.split()
+            self._tail = ''
+            if chunk and parts and not text[-1].isspace():
+                self._tail = parts.pop()
+            if parts or not chunk:
+                return parts
+
+    def get_value(self, position=None):
+        if self._index >= len(self._values):
+            self._values = self._read_values()
+            self._index = 0
+            if not self._values:
+                raise EOFError('No more input values')
+        self._index += 1
+        text = self._values[self._index - 1]
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError('Invalid input value %r' % text)
+
+
+class StdinInputProvider(StreamInputProvider):
+    def __init__(self, buffer_size=1 << 16):
+        super(StdinInputProvider, self).__init__(sys.stdin, buffer_size)
+
+
+class FileInputProvider(StreamInputProvider):
+    def __init__(self, file_path, buffer_size=1 << 16):
+        super(FileInputProvider, self).__init__(open(file_path, 'r', buffering=buffer_size), buffer_size)
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
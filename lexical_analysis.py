@@ -1,24 +1,39 @@
 import re
-from common import type_regexes
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from common import keywords, special_substrings, terminal_lexemes, type_terminal_numbers
 from file_wrapper import FileWrapper, CSVWrapper
 
 
+def get_constant_value(text):
+    try:
+        converted = int(text)
+    except ValueError:
+        return float(text)
+    if str(converted) == text:
+        return converted
+    return float(text)
+
+
 class Lexeme(object):
-    def __init__(self, text, lex_type, location, terminal_number):
+    def __init__(self, text, lex_type, location, terminal_number, index=None, value=None, folded=False):
         self.text = text
         self.lex_type = lex_type
         self.location = location
         self.terminal_number = terminal_number
+        self.index = index
         self.matched = False
+        self.folded = folded
+        self._value = value
 
     @property
     def value(self):
         if self.lex_type != 'constant':
             return self.text
-        converted = int(self.text)
-        if str(converted) == self.text:
-            return converted
-        return float(self.text)
+        if self._value is None:
+            self._value = get_constant_value(self.text)
+        return self._value
 
     @property
     def line(self):
@@ -37,137 +52,318 @@ class Lexeme(object):
     __repr__ = __str__
 
 
-class _LineSplitter(object):
-    def __init__(self, special_substrings):
-        special_for_regex = sorted(list(special_substrings), key=lambda substring: -len(substring))
-        special_for_regex = [re.escape(substring) for substring in special_for_regex]
-        special_for_regex.append('\\s+')
-        regex = '(%s)' % '|'.join(special_for_regex)
-        self._regex = re.compile(regex)
+class SymbolTable(object):
+    def __init__(self, table_type):
+        self.table_type = table_type
+        self.names = []
+        self.indexes = dict()
 
-    def get_tokens(self, line):
-        tokens = re.split(self._regex, line)
-        if ''.join(tokens) != line:
-            raise ValueError('self-check failed')
-        tokens_with_indexes = []
-        current_index = 0
-        for token in tokens:
-            if token and not token.isspace():
-                tokens_with_indexes.append((current_index, token))
-            current_index += len(token)
-        return tokens_with_indexes
+    def __len__(self):
+        return len(self.names)
 
+    def __contains__(self, name):
+        return name in self.indexes
 
-class LexicalAnalyzer(object):
+    def add(self, name):
+        index = self.indexes.get(name)
+        if index is None:
+            index = len(self.names)
+            self.indexes[name] = index
+            self.names.append(name)
+        return index
+
+    def to_list(self):
+        return [['index', self.table_type]] + [[index + 1, name] for index, name in enumerate(self.names)]
+
+
+class ConstantPool(SymbolTable):
+    def __init__(self, table_type='constant'):
+        super(ConstantPool, self).__init__(table_type)
+        self.values = []
+
+    def add(self, name):
+        index = self.indexes.get(name)
+        if index is None:
+            index = super(ConstantPool, self).add(name)
+            try:
+                self.values.append(get_constant_value(name))
+            except ValueError:
+                self.values.append(None)
+        return index
+
+
+class LexemeTable(object):
     def __init__(self):
-        special_substrings = {
-            ';',
-            '(',
-            ')',
-            '==',
-            '!=',
-            '>=',
-            '<=',
-            '>',
-            '<',
-            '+',
-            '-',
-            '*',
-            '/',
-            '=',
-            '{',
-            '}',
-            '^'
-        }
-        keywords = {
-            'if',
-            'then',
-            'else',
-            'while',
-            'do',
-            'enddo',
-            'write',
-            'read'
+        self.terminal_numbers = array('H')
+        self.lines = array('I')
+        self.columns = array('I')
+        self.text_ids = array('I')
+        self.identifiers = SymbolTable('identifier')
+        self.constants = ConstantPool()
+        self._symbol_tables = {'identifier': self.identifiers, 'constant': self.constants}
+        self._texts = []
+        self._text_types = []
+        self._text_symbol_indexes = []
+        self._text_ids = dict()
+        self._cached_index = None
+        self._cached_lexeme = None
+
+    def __len__(self):
+        return len(self.text_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get_lexeme(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+            if index < 0:
+                raise IndexError('Lexeme index out of range')
+        if index != self._cached_index:
+            self._cached_lexeme = self._get_lexeme(index)
+            self._cached_index = index
+        return self._cached_lexeme
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._get_lexeme(index)
+
+    def _get_lexeme(self, index):
+        text_id = self.text_ids[index]
+        lex_type = self._text_types[text_id]
+        symbol_index = self._text_symbol_indexes[text_id]
+        value = self.constants.values[symbol_index] if lex_type == 'constant' else None
+        return Lexeme(self._texts[text_id], lex_type, (self.lines[index], self.columns[index]),
+                      self.terminal_numbers[index], symbol_index, value)
+
+    def _intern(self, text, lex_type):
+        text_id = self._text_ids.get(text)
+        if text_id is None:
+            text_id = len(self._texts)
+            self._text_ids[text] = text_id
+            self._texts.append(text)
+            self._text_types.append(lex_type)
+            symbol_table = self._symbol_tables.get(lex_type)
+            self._text_symbol_indexes.append(symbol_table.add(text) if symbol_table is not None else None)
+        return text_id
+
+    def append(self, text, lex_type, location, terminal_number):
+        self.terminal_numbers.append(terminal_number)
+        self.lines.append(location[0])
+        self.columns.append(location[1])
+        self.text_ids.append(self._intern(text, lex_type))
+
+    def extend_row(self, row_number, tokens):
+        for column, text, lex_type, terminal_number in tokens:
+            self.terminal_numbers.append(terminal_number)
+            self.lines.append(row_number)
+            self.columns.append(column)
+            self.text_ids.append(self._intern(text, lex_type))
+
+    def text(self, index):
+        return self._texts[self.text_ids[index]]
+
+    def lex_type(self, index):
+        return self._text_types[self.text_ids[index]]
+
+    def extend(self, table):
+        text_ids = [self._intern(text, lex_type) for text, lex_type in zip(table._texts, table._text_types)]
+        self.terminal_numbers.extend(table.terminal_numbers)
+        self.lines.extend(table.lines)
+        self.columns.extend(table.columns)
+        self.text_ids.extend(text_ids[text_id] for text_id in table.text_ids)
+
+    def symbol_index(self, index):
+        return self._text_symbol_indexes[self.text_ids[index]]
+
+    def get_indexes(self, lex_type):
+        type_text_ids = {text_id for text_id, text_type in enumerate(self._text_types) if text_type == lex_type}
+        if not type_text_ids:
+            return []
+        return [index for index, text_id in enumerate(self.text_ids) if text_id in type_text_ids]
+
+
+class _Scanner(object):
+    def __init__(self, keywords, special_substrings, terminal_lexemes, identifier_number, constant_number):
+        special_for_regex = sorted(special_substrings, key=lambda substring: -len(substring))
+        keywords_for_regex = sorted(keywords, key=lambda keyword: -len(keyword))
+        word_character = self._get_word_character_regex(special_substrings)
+        regex = '|'.join([
+            '(?P<terminal>%s|(?:%s)(?!%s))' % ('|'.join(map(re.escape, special_for_regex)),
+                                             '|'.join(map(re.escape, keywords_for_regex)),
+                                             word_character),
+            '(?P<constant>(?=\\d|\\.\\d)%s+)' % word_character,
+            '(?P<identifier>[_a-zA-Z0-9]+(?!%s))' % word_character,
+            '(?P<error>%s+)' % word_character,
+        ])
+        self._finditer = re.compile(regex).finditer
+        self._terminal_lexemes = terminal_lexemes
+        self._type_numbers = {
+            'identifier': identifier_number,
+            'constant': constant_number,
+            'error': constant_number,
         }
-        reserved_lexemes_list = sorted(keywords | special_substrings)
-        self.terminal_lexemes = {name: i for i, name in enumerate(list(reversed(reserved_lexemes_list)))}
-        self._line_splitter = _LineSplitter(special_substrings)
-        self._type_regexes = {lex_type: re.compile(regex) for lex_type, regex in type_regexes.items()}
+
+    @staticmethod
+    def _get_word_character_regex(special_substrings):
+        single_characters = {substring for substring in special_substrings if len(substring) == 1}
+        prefixes = dict()
+        for substring in special_substrings:
+            if substring[0] not in single_characters:
+                prefixes.setdefault(substring[0], []).append(substring[1:])
+        excluded = ''.join(map(re.escape, sorted(single_characters | set(prefixes))))
+        alternatives = ['[^\\s%s]' % excluded]
+        for prefix, tails in sorted(prefixes.items()):
+            alternatives.append('%s(?!%s)' % (re.escape(prefix), '|'.join(map(re.escape, tails))))
+        return '(?:%s)' % '|'.join(alternatives)
+
+    def get_tokens(self, line):
+        tokens = []
+        terminal_lexemes = self._terminal_lexemes
+        type_numbers = self._type_numbers
+        for match in self._finditer(line):
+            lex_type = match.lastgroup
+            text = match.group()
+            if lex_type == 'terminal':
+                terminal_number = terminal_lexemes[text]
+            else:
+                terminal_number = type_numbers[lex_type]
+            tokens.append((match.start(), text, lex_type, terminal_number))
+        return tokens
+
+
+_worker_lexical_analyzer = None
+
+
+def _get_lexeme_table_for_chunk(chunk):
+    global _worker_lexical_analyzer
+    if _worker_lexical_analyzer is None:
+        _worker_lexical_analyzer = LexicalAnalyzer()
+    first_row_number, rows = chunk
+    return _worker_lexical_analyzer.get_lexeme_table(rows, first_row_number)
+
+
+class LexicalAnalyzer(object):
+    def __init__(self, processes=None, chunk_rows=20000):
+        self.processes = processes
+        self.chunk_rows = chunk_rows
+        self.terminal_lexemes = dict(terminal_lexemes)
+        self._scanner = _Scanner(keywords, special_substrings, self.terminal_lexemes,
+                                 identifier_number=type_terminal_numbers['identifier'],
+                                 constant_number=type_terminal_numbers['constant'])
 
     def get_lexemes(self, rows):
-        lexemes = []
-        for row_number, row in enumerate(rows):
-            lexemes.extend(self._get_lexemes_for_line(row_number, row))
-        return lexemes
-
-    def _get_lexemes_for_line(self, row_number, row):
-        lexemes = []
-        for start_index, token in self._line_splitter.get_tokens(row):
-            lex_type = self._get_type(token)
-            current_lexeme = Lexeme(token, lex_type, (row_number, start_index),
-                                    self._get_terminal_number(token, lex_type))
-            lexemes.append(current_lexeme)
-        return lexemes
-
-    def _get_type(self, text):
-        if text in self.terminal_lexemes:
-            return 'terminal'
-        for lex_type, regex in self._type_regexes.items():
-            if re.match(regex, text):
-                return lex_type
-        return 'error'
-
-    def _get_terminal_number(self, text, lex_type):
-        if text in self.terminal_lexemes:
-            return self.terminal_lexemes[text]
-        elif lex_type == 'identifier':
-            return len(self.terminal_lexemes)
-        return len(self.terminal_lexemes) + 1
+        return list(self.iter_lexemes(rows))
+
+    def iter_lexemes(self, rows):
+        """Yield lexemes row by row. analyze does not stream through this: the parser
+        starts only after the whole table is built, because lexical errors are
+        reported first and the lexeme, identifier and constant tables are written
+        before parsing."""
+        for row_number, tokens in enumerate(self._iter_row_tokens(rows)):
+            yield from self._get_lexemes_for_line(row_number, tokens)
+
+    def get_lexeme_table(self, rows, first_row_number=0):
+        table = LexemeTable()
+        for row_number, tokens in enumerate(self._iter_row_tokens(rows), first_row_number):
+            table.extend_row(row_number, tokens)
+        return table
+
+    def get_parallel_lexeme_table(self, rows, processes=None):
+        chunks = self._iter_row_chunks(rows)
+        first_chunk = next(chunks)
+        if len(first_chunk[1]) < self.chunk_rows:
+            return self.get_lexeme_table(first_chunk[1])
+        table = LexemeTable()
+        with ProcessPoolExecutor(max_workers=processes or self.processes) as executor:
+            chunk_tables = executor.map(_get_lexeme_table_for_chunk, self._chain_chunks(first_chunk, chunks))
+            for chunk_table in chunk_tables:
+                table.extend(chunk_table)
+        return table
+
+    def _iter_row_chunks(self, rows):
+        rows = iter(rows)
+        first_row_number = 0
+        while True:
+            chunk = list(islice(rows, self.chunk_rows))
+            yield first_row_number, chunk
+            if len(chunk) < self.chunk_rows:
+                return
+            first_row_number += len(chunk)
 
     @staticmethod
-    def _get_table(lexemes, table_type):
-        table = {'index': table_type}
-        for lexeme in lexemes:
-            if lexeme.lex_type == table_type:
-                if not (lexeme.text in table.values()):
-                    index = len(table)
-                    table[index] = lexeme.text
-        return [[index, text] for index, text in table.items()]
+    def _chain_chunks(first_chunk, chunks):
+        yield first_chunk
+        for chunk in chunks:
+            if chunk[1]:
+                yield chunk
+
+    def _iter_row_tokens(self, rows):
+        get_tokens = self._scanner.get_tokens
+        for row in rows:
+            yield get_tokens(row)
+
+    @staticmethod
+    def _get_lexemes_for_line(row_number, tokens):
+        return [Lexeme(text, lex_type, (row_number, column), terminal_number)
+                for column, text, lex_type, terminal_number in tokens]
 
     @staticmethod
     def _get_lexemes_list(lexemes):
-        lexemes_list = [['line', 'column', 'name', 'type', 'number']]
+        yield ['line', 'column', 'name', 'type', 'number']
         for lexeme in lexemes:
-            lexemes_list.append(lexeme.to_list())
-        return lexemes_list
+            yield lexeme.to_list()
 
     def analyze(self, file):
-        lexemes = self.get_lexemes(file.rows)
+        """Build the full lexeme table before returning it to the parser; see iter_lexemes."""
+        if self.processes:
+            lexemes = self.get_parallel_lexeme_table(file.iter_rows())
+        else:
+            lexemes = self.get_lexeme_table(file.iter_rows())
         error_log_list = []
-        for lexeme in lexemes:
-            if lexeme.lex_type == 'error':
-                error_log_list.append(AnalysisError(file=file,
-                                                    error_type="Lexical Error",
-                                                    lexeme=lexeme,
-                                                    message="Unknown symbol"))
+        for index in lexemes.get_indexes('error'):
+            error_log_list.append(AnalysisError(file=file,
+                                                error_type="Lexical Error",
+                                                lexeme=lexemes[index],
+                                                message="Unknown symbol"))
         if not error_log_list:
             lexemes_list = self._get_lexemes_list(lexemes)
-            identifiers = self._get_table(lexemes, 'identifier')
-            constants = self._get_table(lexemes, 'constant')
             CSVWrapper.write_csv(file.lexemes_path, lexemes_list)
-            CSVWrapper.write_csv(file.identifiers_path, identifiers)
-            CSVWrapper.write_csv(file.constants_path, constants)
+            CSVWrapper.write_csv(file.identifiers_path, lexemes.identifiers.to_list())
+            CSVWrapper.write_csv(file.constants_path, lexemes.constants.to_list())
             return lexemes, None
         return lexemes, AnalysisError.to_string(error_log_list)
 
 
+class IncrementalLexicalAnalyzer(LexicalAnalyzer):
+    def __init__(self):
+        super(IncrementalLexicalAnalyzer, self).__init__()
+        self._line_tokens = dict()
+        self.relexed_rows = 0
+
+    def _iter_row_tokens(self, rows):
+        get_tokens = self._scanner.get_tokens
+        previous_line_tokens = self._line_tokens
+        line_tokens = dict()
+        self.relexed_rows = 0
+        for row in rows:
+            tokens = line_tokens.get(row)
+            if tokens is None:
+                tokens = previous_line_tokens.get(row)
+                if tokens is None:
+                    tokens = get_tokens(row)
+                    self.relexed_rows += 1
+                line_tokens[row] = tokens
+            yield tokens
+        self._line_tokens = line_tokens
+
+
 class AnalysisError(object):
     def __init__(self, file, error_type, lexeme, message):
         self.file = file
         self.lexeme = lexeme
         self.error_type = error_type
         self.message = message
-        self.row = self.file.rows[self.lexeme.line]
+        self.row = self.file.get_row(self.lexeme.line)
 
     def __str__(self):
         return "File {}\nLine {}, column {}\n{}\n{}: {} '{}'".format(self.file.file_path,
@@ -1,14 +1,27 @@
+import asyncio
+import io
+import os
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
-from lexical_analysis import LexicalAnalyzer
-from postfix_transformation import PostfixProcessor, PostfixExecutor, PostfixJump, PostfixMark
-from syntax_analysis import SyntaxAnalyzer
+from file_wrapper import FileWrapper, CSVWrapper
+from lexical_analysis import LexicalAnalyzer, IncrementalLexicalAnalyzer, Lexeme
+from postfix_transformation import PostfixProcessor, PostfixExecutor, PostfixJump, PostfixMark, ExpressionProcessor, \
+    SyntaxDirectedTranslator
+from postfix_optimization import PostfixOptimizer
+from bytecode import BytecodeGenerator, BytecodeProgram, BytecodeExecutor, ExecutionError, disassemble, opcode_names
+from python_backend import PythonGenerator, PythonExecutor, _StructureError
+from input_provider import ListInputProvider, StreamInputProvider, FileInputProvider
+from compiler import Compiler
+from syntax_analysis import SyntaxAnalyzer, CompositeSymbol, SimpleSymbol, PackratMemo, ParseContext, \
+    ArenaParseContext, grammar_source, compile_grammar, get_grammar_table, get_grammar_table_path
 
 
 class _Combiner(object):
-    def __init__(self, root='expression'):
+    def __init__(self, root='expression', **syntax_options):
         self.lexical_analyzer = LexicalAnalyzer()
-        self.syntax_analyzer = SyntaxAnalyzer()
+        self.syntax_analyzer = SyntaxAnalyzer(**syntax_options)
         self.syntax_analyzer.set_root(root)
         self.postfix_transformer = PostfixProcessor()
         self.executor = PostfixExecutor()
@@ -48,6 +61,401 @@ def dict_to_string(dictionary, aggregate=', '):
     return aggregate.join(strings)
 
 
+def lexemes_to_tuples(lexemes):
+    return [(lexeme.text, lexeme.lex_type, lexeme.location, lexeme.terminal_number) for lexeme in lexemes]
+
+
+class LexicalTest(unittest.TestCase):
+    def setUp(self):
+        self.lexical_analyzer = LexicalAnalyzer()
+
+    def test0(self):
+        lexemes = self.lexical_analyzer.get_lexemes(['while a1>=.5 do'])
+        self.assertEquals(lexemes_to_tuples(lexemes), [
+            ('while', 'terminal', (0, 0), 3),
+            ('a1', 'identifier', (0, 6), 25),
+            ('>=', 'terminal', (0, 8), 11),
+            ('.5', 'constant', (0, 10), 26),
+            ('do', 'terminal', (0, 13), 9),
+        ])
+
+    def test1(self):
+        lexemes = self.lexical_analyzer.get_lexemes(['ifx=a!b', '  enddo;'])
+        self.assertEquals(lexemes_to_tuples(lexemes), [
+            ('ifx', 'identifier', (0, 0), 25),
+            ('=', 'terminal', (0, 3), 14),
+            ('a!b', 'error', (0, 4), 26),
+            ('enddo', 'terminal', (1, 2), 7),
+            (';', 'terminal', (1, 7), 17),
+        ])
+
+    def test2(self):
+        lexemes = self.lexical_analyzer.get_lexemes(['a!=12abc'])
+        self.assertEquals(lexemes_to_tuples(lexemes), [
+            ('a', 'identifier', (0, 0), 25),
+            ('!=', 'terminal', (0, 1), 24),
+            ('12abc', 'constant', (0, 3), 26),
+        ])
+
+
+class StreamingLexicalTest(unittest.TestCase):
+    def setUp(self):
+        self.lexical_analyzer = LexicalAnalyzer()
+        handle, self.file_path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(handle, 'w') as output_file:
+            output_file.write('a = 1;\n\nwrite a + 12;\n')
+        self.file = FileWrapper(self.file_path)
+
+    def tearDown(self):
+        os.remove(self.file_path)
+
+    def test0(self):
+        self.assertEquals(list(self.file.iter_rows(chunk_size=3)), self.file.rows)
+
+    def test1(self):
+        self.assertEquals(self.file.get_row(2), 'write a + 12;')
+
+    def test2(self):
+        lexemes = self.lexical_analyzer.iter_lexemes(self.file.iter_rows(chunk_size=4))
+        self.assertEquals(next(lexemes).text, 'a')
+        self.assertEquals(lexemes_to_tuples(lexemes), lexemes_to_tuples(self.lexical_analyzer.get_lexemes(
+            self.file.rows))[1:])
+
+
+class IncrementalLexicalTest(unittest.TestCase):
+    def setUp(self):
+        self.lexical_analyzer = IncrementalLexicalAnalyzer()
+        self.rows = ['a = 1;', 'b = a + 1;', 'write b;']
+        self.lexical_analyzer.get_lexemes(self.rows)
+
+    def test0(self):
+        self.assertEquals(self.lexical_analyzer.relexed_rows, 3)
+        rows = ['a = 1;', 'b = a - 1;', 'write b;']
+        lexemes = self.lexical_analyzer.get_lexemes(rows)
+        self.assertEquals(self.lexical_analyzer.relexed_rows, 1)
+        self.assertEquals(lexemes_to_tuples(lexemes), lexemes_to_tuples(LexicalAnalyzer().get_lexemes(rows)))
+
+    def test1(self):
+        rows = ['c = 2;', '', 'a = 1;', 'b = a + 1;', 'write b;']
+        table = self.lexical_analyzer.get_lexeme_table(rows)
+        self.assertEquals(self.lexical_analyzer.relexed_rows, 2)
+        self.assertEquals(lexemes_to_tuples(table), lexemes_to_tuples(LexicalAnalyzer().get_lexemes(rows)))
+
+
+class LexemeTableTest(unittest.TestCase):
+    def setUp(self):
+        self.lexical_analyzer = LexicalAnalyzer()
+        self.rows = ['a = 1;', 'b = a $ 1;']
+        self.table = self.lexical_analyzer.get_lexeme_table(self.rows)
+
+    def test0(self):
+        self.assertEquals(lexemes_to_tuples(self.table), lexemes_to_tuples(self.lexical_analyzer.get_lexemes(self.rows)))
+
+    def test1(self):
+        self.assertEquals(len(self.table), 10)
+        self.assertEquals(lexemes_to_tuples([self.table[-1]]), [(';', 'terminal', (1, 9), 17)])
+        self.assertEquals([lexeme.text for lexeme in self.table[1:3]], ['=', '1'])
+
+    def test2(self):
+        self.assertEquals(self.table.get_indexes('error'), [7])
+        self.assertEquals(self.table.text(7), '$')
+        self.assertEquals(self.table.lex_type(5), 'terminal')
+
+    def test3(self):
+        rows = ['a = 1; i = 0;', 'while i < 2 do {write a * (i + 1); i = i + 1;} enddo;']
+        table = self.lexical_analyzer.get_lexeme_table(rows)
+        self.assertIs(table[3], table[3])
+        with self.assertRaises(IndexError):
+            table[-len(table) - 1]
+        syntax_analyzer = SyntaxAnalyzer(engine='stack', lookahead=True, arena=True)
+        translator = SyntaxDirectedTranslator(syntax_analyzer)
+        lexemes = self.lexical_analyzer.get_lexemes(rows)
+        self.assertEquals(to_string(translator.get_postfix_matches(table)[0]),
+                          to_string(translator.get_postfix_matches(lexemes)[0]))
+        self.assertEquals(match_to_string(syntax_analyzer.get_match(table, 'statement_list')),
+                          match_to_string(syntax_analyzer.get_match(lexemes, 'statement_list')))
+
+
+class ParallelLexicalTest(unittest.TestCase):
+    def setUp(self):
+        self.rows = ['a%s = b + %s;' % (i % 7, i % 5) for i in range(23)] + ['write a3;']
+
+    def test0(self):
+        serial_table = LexicalAnalyzer().get_lexeme_table(self.rows)
+        parallel_table = LexicalAnalyzer(chunk_rows=5).get_parallel_lexeme_table(self.rows, processes=2)
+        self.assertEquals(lexemes_to_tuples(parallel_table), lexemes_to_tuples(serial_table))
+        self.assertEquals([lexeme.index for lexeme in parallel_table], [lexeme.index for lexeme in serial_table])
+        self.assertEquals(parallel_table.identifiers.names, serial_table.identifiers.names)
+        self.assertEquals(parallel_table.constants.values, serial_table.constants.values)
+
+    def test1(self):
+        table = LexicalAnalyzer(chunk_rows=100).get_parallel_lexeme_table(iter(self.rows), processes=2)
+        self.assertEquals(lexemes_to_tuples(table), lexemes_to_tuples(LexicalAnalyzer().get_lexemes(self.rows)))
+
+    def test2(self):
+        table = LexicalAnalyzer(chunk_rows=6).get_parallel_lexeme_table(self.rows[:18], processes=2)
+        self.assertEquals(lexemes_to_tuples(table), lexemes_to_tuples(LexicalAnalyzer().get_lexemes(self.rows[:18])))
+
+    def test3(self):
+        with self.assertRaises(ValueError):
+            Compiler(incremental=True, processes=2)
+
+
+class SymbolTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = LexicalAnalyzer().get_lexeme_table(['b = a + 2;', 'a = b * 2 + 1.5;'])
+
+    def test0(self):
+        self.assertEquals(self.table.identifiers.names, ['b', 'a'])
+        self.assertEquals(self.table.identifiers.indexes, {'b': 0, 'a': 1})
+        self.assertEquals(self.table.constants.names, ['2', '1.5'])
+
+    def test1(self):
+        self.assertEquals([lexeme.index for lexeme in self.table],
+                          [0, None, 1, None, 0, None, 1, None, 0, None, 0, None, 1, None])
+
+    def test2(self):
+        self.assertEquals(self.table.identifiers.to_list(), [['index', 'identifier'], [1, 'b'], [2, 'a']])
+
+
+class ConstantPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.table = LexicalAnalyzer().get_lexeme_table(['a = 2 + 1.5 + .25 + 007 + 2;'])
+
+    def test0(self):
+        self.assertEquals(self.table.constants.names, ['2', '1.5', '.25', '007'])
+        self.assertEquals(self.table.constants.values, [2, 1.5, 0.25, 7.0])
+
+    def test1(self):
+        self.assertEquals([lexeme.value for lexeme in self.table if lexeme.lex_type == 'constant'],
+                          [2, 1.5, 0.25, 7.0, 2])
+
+
+syntax_samples = [
+    ('expression', '(((1 + 1888) - (2 + 3)) + (2 + (2+3))) == 12'),
+    ('expression', '((1 + 1888) - (2 + 3)) + (2 + (2+3))) == 12'),
+    ('expression', '1 * 1 * 12 + 3 / 111 * 3 - -123421 + (100400 * +a - 4342)'),
+    ('expression', '1 +'),
+    ('expression', '+'),
+    ('expression', '1 + 2)'),
+    ('expression', '1 2'),
+    ('iterative_symbol_for_expression_0', '+'),
+    ('assignment_statement', 'a = (56 + 2^141) / 3'),
+    ('assignment_statement', 'a = = 3'),
+    ('conditional_statement', 'if 12 > 3 then {a = 1; b = c^3;} else {a=3; a=3+7+a;}'),
+    ('statement_list', [
+        'while a >= 10 do {',
+        '    b = b + 1;',
+        '    if b == 20 then',
+        '        {c = b - 5;}',
+        '    else',
+        '        {a = 10;};',
+        '    read b;',
+        '    write b * 2;',
+        '    }',
+        'enddo;']),
+    ('statement_list', ['a = 1;', 'b = a + ;']),
+    ('statement_list', ['a = 1;', 'if a then {b = 2;}']),
+    ('statement_list', ['a = 1', 'b = 2;']),
+]
+
+
+def match_to_string(match):
+    if match is None:
+        return 'None'
+    if isinstance(match, Lexeme):
+        return 'error at %s:%s %s' % (match.line, match.column, match.text)
+    return '%s: %s' % (match.symbol.name, to_string(match.get_terminal_matches()))
+
+
+class CursorSyntaxTest(unittest.TestCase):
+    def assert_same_matches(self, **syntax_options):
+        for root, lines in syntax_samples:
+            expected = match_to_string(_Combiner(root).get_match(lines))
+            actual = match_to_string(_Combiner(root, **syntax_options).get_match(lines))
+            self.assertEquals(expected, actual)
+
+    def test0(self):
+        self.assert_same_matches(engine='cursor')
+
+    def test1(self):
+        match = _Combiner('statement_list', engine='cursor').get_match(['a = 1;', 'write a;'])
+        self.assertEquals(to_string(match.get_terminal_matches()), 'a = 1 ; write a ;')
+
+
+class LookaheadSyntaxTest(unittest.TestCase):
+    def test0(self):
+        CursorSyntaxTest.assert_same_matches(self, engine='cursor', lookahead=True)
+
+    def test1(self):
+        syntax_analyzer = SyntaxAnalyzer(engine='cursor', lookahead=True)
+        self.assertEquals(syntax_analyzer.lookahead_conflicts, {'factor': ['+', '-']})
+
+    def test2(self):
+        match = _Combiner('statement_list', engine='cursor', lookahead=True).get_match(['read r;', 'write r;'])
+        self.assertEquals(to_string(match.get_terminal_matches()), 'read r ; write r ;')
+
+
+class StackSyntaxTest(unittest.TestCase):
+    def test0(self):
+        CursorSyntaxTest.assert_same_matches(self, engine='stack')
+
+    def test1(self):
+        CursorSyntaxTest.assert_same_matches(self, engine='stack', lookahead=True, packrat=True, memo_size=5)
+
+    def test2(self):
+        depth = 400
+        lines = ['if a then {'] * depth + ['b = ' + '(' * depth + '1' + ')' * depth + ';'] + \
+                ['} else {c = 1;};'] * depth
+        match = _Combiner('statement_list', engine='stack', lookahead=True).get_match(lines)
+        self.assertEquals(match.symbol.name, 'statement_list')
+        terminal_matches = match.get_terminal_matches()
+        self.assertEquals(len(terminal_matches), 15 * depth + 4)
+        self.assertEquals(match.text.split(), to_string(terminal_matches).split())
+
+
+class ConcurrentSyntaxTest(unittest.TestCase):
+    def assert_same_matches_in_threads(self, **syntax_options):
+        syntax_analyzer = SyntaxAnalyzer(**syntax_options)
+        lexical_analyzer = LexicalAnalyzer()
+        samples = syntax_samples * 20
+
+        def get_match_string(sample):
+            root, lines = sample
+            if not isinstance(lines, list):
+                lines = [lines]
+            return match_to_string(syntax_analyzer.get_match(lexical_analyzer.get_lexemes(lines), root))
+
+        expected = [match_to_string(_Combiner(root).get_match(lines)) for root, lines in samples]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            actual = list(executor.map(get_match_string, samples))
+        self.assertEquals(expected, actual)
+
+    def test0(self):
+        self.assert_same_matches_in_threads()
+
+    def test1(self):
+        self.assert_same_matches_in_threads(engine='cursor', lookahead=True, packrat=True)
+
+    def test2(self):
+        self.assert_same_matches_in_threads(engine='stack', lookahead=True)
+
+    def test3(self):
+        syntax_analyzer = SyntaxAnalyzer()
+        lexemes = LexicalAnalyzer().get_lexemes(['1 +'])
+        self.assertEquals(syntax_analyzer.get_match(lexemes, 'expression'), None)
+        lexemes = LexicalAnalyzer().get_lexemes([')'])
+        self.assertEquals(match_to_string(syntax_analyzer.get_match(lexemes, 'expression')), 'error at 0:0 )')
+
+
+class PackratSyntaxTest(unittest.TestCase):
+    def test0(self):
+        CursorSyntaxTest.assert_same_matches(self, engine='cursor', packrat=True)
+
+    def test1(self):
+        CursorSyntaxTest.assert_same_matches(self, engine='cursor', lookahead=True, packrat=True, memo_size=3)
+
+    def test2(self):
+        syntax_analyzer = SyntaxAnalyzer(engine='cursor', packrat=True, memo_size=10)
+        lexemes = LexicalAnalyzer().get_lexemes(['(((1 + a) * 2) - -b) / (a)'])
+        context = syntax_analyzer.create_context(lexemes)
+        match = syntax_analyzer.get_match(lexemes, 'expression', context)
+        self.assertEquals(to_string(match.get_terminal_matches()), '( ( ( 1 + a ) * 2 ) - - b ) / ( a )')
+        self.assertEquals(len(context.memo), 10)
+
+    def test3(self):
+        operand = CompositeSymbol([[SimpleSymbol({'('}), SimpleSymbol({'1'}), SimpleSymbol({')'})]])
+        operand.name = 'operand'
+        root = CompositeSymbol([[operand, SimpleSymbol({'+'})], [operand, SimpleSymbol({'-'})]])
+        root.name = 'root'
+        lexemes = LexicalAnalyzer().get_lexemes(['(1)-'])
+        memo = PackratMemo()
+        match, position = root.get_match_at(lexemes, 0, ParseContext(memo))
+        self.assertEquals(to_string(match.get_terminal_matches()), '( 1 ) -')
+        self.assertEquals(position, 4)
+        self.assertEquals(memo.hits, 1)
+
+
+class ArenaSyntaxTest(unittest.TestCase):
+    def test0(self):
+        CursorSyntaxTest.assert_same_matches(self, engine='cursor', arena=True)
+
+    def test1(self):
+        CursorSyntaxTest.assert_same_matches(self, engine='stack', lookahead=True, packrat=True, memo_size=5,
+                                             arena=True)
+
+    def test2(self):
+        syntax_analyzer = SyntaxAnalyzer(engine='stack', lookahead=True, arena=True)
+        lexemes = LexicalAnalyzer().get_lexemes(['a = 1;', 'if a > 0 then {write (a + 2) * 3;} else {read a;};'])
+        context = syntax_analyzer.create_context(lexemes)
+        match = syntax_analyzer.get_match(lexemes, 'statement_list', context)
+        self.assertEquals([terminal_match.lexeme for terminal_match in match.get_terminal_matches()], lexemes)
+        self.assertEquals([context.arena.token_indexes[node] for node in context.arena.terminal_nodes],
+                          list(range(len(lexemes))))
+        statement = match.children[2]
+        self.assertEquals(statement.symbol.name, 'statement')
+        self.assertEquals(to_string(statement.get_terminal_matches()),
+                          'if a > 0 then { write ( a + 2 ) * 3 ; } else { read a ; }')
+
+    def test3(self):
+        operand = CompositeSymbol([[SimpleSymbol({'('}), SimpleSymbol({'1'}), SimpleSymbol({')'})]])
+        operand.name = 'operand'
+        tail = CompositeSymbol([[operand, SimpleSymbol({'*'})], [operand, SimpleSymbol({'/'})]])
+        tail.name = 'tail'
+        wrapper = CompositeSymbol([[operand]])
+        wrapper.name = 'wrapper'
+        root = CompositeSymbol([[operand, SimpleSymbol({'-'}), tail], [wrapper, SimpleSymbol({'+'})]])
+        root.name = 'root'
+        lexemes = LexicalAnalyzer().get_lexemes(['(1)-(1)/'])
+        context = ArenaParseContext(lexemes, PackratMemo())
+        match, position = root.get_match_at(lexemes, 0, context)
+        match = context.get_result_match(match)
+        self.assertEquals(to_string(match.get_terminal_matches()), '( 1 ) - ( 1 ) /')
+        self.assertEquals([child.text for child in match.children], ['( 1 )', '-', '( 1 ) /'])
+        self.assertEquals(position, 8)
+        self.assertEquals(context.memo.hits, 2)
+
+    def test4(self):
+        with self.assertRaises(ValueError):
+            SyntaxAnalyzer(arena=True)
+
+
+class GrammarTableTest(unittest.TestCase):
+    def test0(self):
+        source = grammar_source + '# cached\n'
+        with tempfile.TemporaryDirectory() as directory:
+            path = get_grammar_table_path(source, directory)
+            table = get_grammar_table(source, directory)
+            self.assertTrue(os.path.exists(path))
+            self.assertEquals(table, compile_grammar(source))
+            self.assertTrue(get_grammar_table(source, directory) is table)
+
+    def test1(self):
+        source = grammar_source + '# corrupted\n'
+        with tempfile.TemporaryDirectory() as directory:
+            path = get_grammar_table_path(source, directory)
+            with open(path, 'w') as file:
+                file.write('{"hash": ')
+            self.assertEquals(get_grammar_table(source, directory)['hash'], compile_grammar(source)['hash'])
+
+    def test2(self):
+        self.assertNotEqual(get_grammar_table_path(grammar_source), get_grammar_table_path(grammar_source + '#'))
+        table = compile_grammar('list ::= { identifier separator }\nidentifier : regex identifier\n'
+                                'separator : terminals ;')
+        self.assertEquals(table['symbols'], [['iterative', 'list', [1, 2]],
+                                             ['regex', 'identifier', 'identifier'],
+                                             ['terminals', 'separator', [';']]])
+        self.assertEquals(table['lookahead_conflicts'], {})
+
+    def test3(self):
+        with self.assertRaises(ValueError):
+            compile_grammar('list ::= identifier | \nidentifier : regex identifier')
+        with self.assertRaises(ValueError):
+            compile_grammar('item : regex identifier')
+        with self.assertRaises(ValueError):
+            compile_grammar('list ::= missing')
+
+
 class ExpressionTest(unittest.TestCase):
     def setUp(self):
         self.combiner = _Combiner()
@@ -185,6 +593,91 @@ class PostfixExpressionTransformationTest(unittest.TestCase):
         self.assertEquals(to_string(matches), '17 3 12 7 + 6 ^ + *')
 
 
+class _RowsWriter(object):
+    def __init__(self):
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append(row)
+
+
+class PostfixHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.combiner = _Combiner('statement_list')
+
+    def get_postfix(self, lines, history_writer=None):
+        match = self.combiner.get_match(lines)
+        return self.combiner.postfix_transformer.get_postfix_matches(match.get_terminal_matches(), history_writer)
+
+    def test0(self):
+        matches, marks, history = self.get_postfix(['a = 1 + 2;'])
+        self.assertEquals(to_string(matches), 'a 1 2 + =')
+        self.assertIsNone(history)
+
+    def test1(self):
+        writer = _RowsWriter()
+        matches, _, _ = self.get_postfix(['a = -1 + 2;', 'write a;'], writer)
+        self.assertEquals(to_string(matches), 'a 1 @ 2 + = a write')
+        self.assertEquals(writer.rows, [['step', 'enter', 'stack', 'output'],
+                                        [0, 'a', '', 'a'],
+                                        [1, '=', '=', ''],
+                                        [2, '1', '=, @', '1'],
+                                        [3, '+', '=, +', '@'],
+                                        [4, '2', '=, +', '2'],
+                                        [5, ';', '', '+, ='],
+                                        [6, 'write', 'write', ''],
+                                        [7, 'a', 'write', 'a'],
+                                        [8, ';', '', 'write']])
+
+    def test2(self):
+        writer = _RowsWriter()
+        self.combiner.syntax_analyzer.set_root('expression')
+        self.get_postfix('(1 + 2) * 3', writer)
+        self.assertEquals(writer.rows[-2:], [[5, '*', '*', ''], [6, '3', '', '*']])
+
+
+class ExpressionProcessorTest(unittest.TestCase):
+    def setUp(self):
+        self.combiner = _Combiner()
+        self.expression_processor = ExpressionProcessor(self.combiner.syntax_analyzer)
+
+    def get_postfix(self, line):
+        lexemes = self.combiner.lexical_analyzer.get_lexemes([line])
+        return self.expression_processor.get_postfix_matches(lexemes)
+
+    def test0(self):
+        for line in ['1 + 2 * 3 + 100500 / 7 * 99',
+                     '(3 + 4) / (10 - 7) + 2 - 12 * (13 * 169)',
+                     '17 * (3 + (12 + 7)^6)',
+                     '2 ^ 3 ^ 2 - -a * +b',
+                     'b != -a ^ 2 == (b - 1) * -3 + c',
+                     'a + b >= c - d != 1 < 2',
+                     '((((x))))']:
+            matches, position = self.get_postfix(line)
+            expected, _, _ = self.combiner.get_postfix(line)
+            self.assertEquals(to_string(matches), to_string(expected))
+            self.assertEquals(position, len(self.combiner.lexical_analyzer.get_lexemes([line])))
+
+    def test1(self):
+        matches, position = self.get_postfix('-a ^ 2')
+        self.assertEquals(to_string(matches), 'a @ 2 ^')
+        matches, position = self.get_postfix('a * (b - 1) ; c')
+        self.assertEquals(to_string(matches), 'a b 1 - *')
+        self.assertEquals(position, 7)
+
+    def test2(self):
+        self.assertEquals(self.get_postfix('1 + (2 * 3'), (None, 6))
+        self.assertEquals(self.get_postfix('1 + - (2)'), (None, 3))
+        self.assertEquals(self.get_postfix('1 *'), (None, 2))
+
+    def test3(self):
+        matches, _ = self.get_postfix('12 * -(13 * 169)')
+        self.assertIsNone(matches)
+        matches, _ = self.get_postfix('(3 + 4) / (10 - 7) + 2 - 12 * (13 * -169) ^ 2')
+        self.assertEquals(PostfixExecutor().get_output(matches), self.combiner.get_output(
+            '(3 + 4) / (10 - 7) + 2 - 12 * (13 * -169) ^ 2'))
+
+
 class ExecutionTest(unittest.TestCase):
     def setUp(self):
         self.combiner = _Combiner()
@@ -209,6 +702,10 @@ class ExecutionTest(unittest.TestCase):
         result = self.combiner.get_output('1 + 2 * 3 + 100500 / 7 * 99')
         self.assertEquals(1421364.1428571427, result)
 
+    def test5(self):
+        result = self.combiner.get_output('1.5 * 3 + .5')
+        self.assertEquals(5.0, result)
+
 
 class AssignmentTest(unittest.TestCase):
     def setUp(self):
@@ -417,3 +914,552 @@ class IterationalsTest(unittest.TestCase):
         matches_string = 'a 10 < mark_1 jump_on_False a a 1 + = b a 5 * 1 + = mark_0 jump'
         self.assertEquals(to_string(matches), matches_string)
         self.assertEquals(dict_to_string(marks), 'mark_0: 0, mark_1: 19')
+
+
+class SyntaxDirectedTranslatorTest(unittest.TestCase):
+    def setUp(self):
+        self.combiner = _Combiner('statement_list')
+        self.translator = SyntaxDirectedTranslator(self.combiner.syntax_analyzer)
+
+    def get_postfix(self, lines):
+        return self.translator.get_postfix_matches(self.combiner.lexical_analyzer.get_lexemes(lines))
+
+    def test0(self):
+        for lines in [['a = 1 + 2 * -b;', 'write a; read b;'],
+                      ['if b == 20 then', '   {c = b - 5;}', 'else', '   {a = 10;};', 'b = c - a;'],
+                      ['while a >= 10 do {', '    b = b + 1;', '    if b == 20 then', '        {c = b - 5;}',
+                       '    else', '        {a = 10;};', '    read b;', '    write b * 2;', '    }', 'enddo;'],
+                      ['if a then {while b do {b = b - 1;} enddo;} else {if c then {} else {c = 2;};};']]:
+            matches, marks = self.get_postfix(lines)
+            expected_matches, expected_marks, _ = self.combiner.get_postfix(lines)
+            self.assertEquals(to_string(matches), to_string(expected_matches))
+            self.assertEquals(dict_to_string(marks), dict_to_string(expected_marks))
+            self.assertEquals([mark.start_position for mark in marks], list(marks.values()))
+
+    def test1(self):
+        matches, marks = self.get_postfix(['while a < 10 do {', '    a = a + 1;', '    b = a*5 + 1;', '    }', 'enddo;'])
+        self.assertEquals(to_string(matches), 'a 10 < mark_1 jump_on_False a a 1 + = b a 5 * 1 + = mark_0 jump')
+        self.assertEquals(dict_to_string(marks), 'mark_0: 0, mark_1: 19')
+        self.assertEquals(matches[4].mark, list(marks)[1])
+
+    def test2(self):
+        for lines in [['a = 1;', 'b = -a + ;'], ['a = 1'], ['if a then {b = -1;}'], ['read 1;'], ['}'], []]:
+            lexemes = self.combiner.lexical_analyzer.get_lexemes(lines)
+            texts = [lexeme.text for lexeme in lexemes]
+            matches, _ = self.translator.get_postfix_matches(lexemes)
+            self.assertIsNone(matches)
+            self.assertEquals([lexeme.text for lexeme in lexemes], texts)
+
+    def test3(self):
+        matches, _ = self.get_postfix(['a = 2;', 'while a < 20 do {a = a * 2 + -1;} enddo;', 'write a;'])
+        outputs = []
+        self.combiner.executor.get_output(matches, output_function=outputs.append)
+        self.assertEquals(self.combiner.variables, {'a': 33})
+        self.assertEquals(outputs, [33])
+
+    def test4(self):
+        matches, marks = self.get_postfix(['a = ' + '(' * 2000 + 'a' + ' - 1)' * 2000 + ';'])
+        self.assertEquals(to_string(matches), 'a a' + ' 1 -' * 2000 + ' =')
+        with tempfile.TemporaryDirectory() as directory:
+            file = FileWrapper(os.path.join(directory, 'program.txt'))
+            FileWrapper.write_file(file.file_path, 'a = 1;\n' + 'if a == 1 then {' * 2000 + 'write a;' +
+                                   '} else {};' * 2000 + '\n')
+            outputs = []
+            Compiler().get_output(file, outputs.append, None, 0)
+            self.assertEquals(outputs, [1])
+
+
+class BytecodeTest(unittest.TestCase):
+    def setUp(self):
+        self.combiner = _Combiner('statement_list')
+        self.translator = SyntaxDirectedTranslator(self.combiner.syntax_analyzer)
+
+    def get_program(self, lines, optimize=False):
+        postfix, marks = self.translator.get_postfix_matches(self.combiner.lexical_analyzer.get_lexemes(lines))
+        if optimize:
+            postfix, marks, _ = PostfixOptimizer().optimize(postfix, marks)
+        return BytecodeGenerator().get_program(postfix)
+
+    @staticmethod
+    def to_instructions(program):
+        return [(opcode_names[opcode], argument) for opcode, argument in
+                (program.get_instruction(offset) for offset in range(len(program)))]
+
+    def test0(self):
+        program = self.get_program(['a = -1.50 + b;', 'write a; write 1.50; write a * 2;', 'read b;'])
+        self.assertEquals(self.to_instructions(program), [
+            ('push_constant', 0), ('negate', 0), ('push_name', 1), ('add', 0), ('store', 0),
+            ('write_name', 0), ('write_constant', 0), ('push_name', 0), ('push_constant', 1), ('multiply', 0),
+            ('write', 0), ('read', 1)])
+        self.assertEquals(program.names, ['a', 'b'])
+        self.assertEquals(program.constants, [1.5, 2])
+        self.assertEquals(program.constant_texts, ['1.50', '2'])
+        self.assertEquals(program.get_lexeme(3).text, '+')
+        self.assertEquals(program.get_lexeme(3).location, (0, 10))
+
+    def test1(self):
+        program = self.get_program(['while a < 10 do {', '    if a then {a = a + 1;} else {a = 10;};', '}', 'enddo;'])
+        self.assertEquals(self.to_instructions(program), [
+            ('push_name', 0), ('push_constant', 0), ('less', 0), ('jump_if_false', 14),
+            ('push_name', 0), ('jump_if_false', 11),
+            ('push_name', 0), ('push_constant', 1), ('add', 0), ('store', 0), ('jump', 13),
+            ('push_constant', 0), ('store', 0),
+            ('jump', 0)])
+
+    def test2(self):
+        program = self.get_program(['a = 1;', 'while a < 10 do {a = a * 2;} enddo;', 'write a;'])
+        restored = BytecodeProgram.from_bytes(program.to_bytes())
+        self.assertEquals(restored.code, program.code)
+        self.assertEquals(restored.lines, program.lines)
+        self.assertEquals(restored.names, program.names)
+        self.assertEquals(restored.constants, program.constants)
+        self.assertEquals(disassemble(restored), disassemble(program))
+        program = self.get_program(['a = 1e308 * 10; b = 1e308 * 10 - 1e308 * 10; c = 10 ^ 400; write 1.50;'],
+                                   optimize=True)
+        program.add_constant('(1-2j)', 1 - 2j)
+        program.add_constant('(nan+infj)', complex(float('nan'), float('inf')))
+        data = program.to_bytes()
+        self.assertEquals(b'NaN' in data or b'Infinity' in data, False)
+        restored = BytecodeProgram.from_bytes(data)
+        self.assertEquals(restored.constant_texts, ['inf', 'nan', str(10 ** 400), '1.50', '(1-2j)', '(nan+infj)'])
+        self.assertEquals([repr(value) for value in restored.constants], [repr(value) for value in program.constants])
+        self.assertEquals([type(value) for value in restored.constants], [float, float, int, float, complex, complex])
+
+    def test3(self):
+        table = disassemble(self.get_program(['while a do {a = 0;} enddo;']))
+        self.assertEquals(table[0], ['offset', 'opcode', 'argument', 'operand', 'location'])
+        self.assertEquals([row[1] for row in table[1:]],
+                          ['label_0: push_name', 'jump_if_false', 'push_constant', 'store', 'jump', 'label_1: end'])
+        self.assertEquals(table[2][3], 'label_1')
+        self.assertEquals(table[4][3], 'a')
+
+
+class PostfixOptimizationTest(unittest.TestCase):
+    def setUp(self):
+        self.combiner = _Combiner('statement_list')
+        self.translator = SyntaxDirectedTranslator(self.combiner.syntax_analyzer)
+
+    def optimize(self, lines, enabled=True):
+        postfix, marks = self.translator.get_postfix_matches(self.combiner.lexical_analyzer.get_lexemes(lines))
+        return PostfixOptimizer(enabled=enabled).optimize(postfix, marks)
+
+    def test0(self):
+        postfix, marks, report = self.optimize(['a = -10 * 2 + b;', 'c = 1 / 0 + 2 * 3;'])
+        self.assertEquals(to_string(postfix), 'a -20 b + = c 1 0 / 6 + =')
+        self.assertEquals(report, [['action', 'removed', 'result'], ['fold unary', '10 @', '-10'],
+                                   ['fold', '-10 2 *', '-20'], ['fold', '2 3 *', '6']])
+        self.assertEquals(postfix[1].lexeme.value, -20)
+
+    def test1(self):
+        postfix, marks, report = self.optimize(['if 1 < 2 then {a = 1;} else {a = 2;};', 'while 0 do {a = 3;} enddo;'])
+        self.assertEquals(to_string(postfix), 'a 1 =')
+        self.assertEquals(marks, dict())
+        self.assertEquals(report[1:], [
+            ['fold', '1 2 <', 'True'],
+            ['constant branch', 'True mark_0 jump_on_False', ''],
+            ['constant branch', '0 mark_3 jump_on_False', 'mark_3 jump'],
+            ['thread jump', 'mark_1 jump', 'mark_3 jump'],
+            ['thread jump', 'mark_2 jump', 'mark_3 jump'],
+            ['unreachable code', 'a 2 =', ''],
+            ['unreachable code', 'mark_3 jump a 3 = mark_3 jump', ''],
+            ['jump to next', 'mark_3 jump', '']])
+
+    def test2(self):
+        lines = ['a = 0;', 'while a < 10 do {', '    if a then {a = a + 1;} else {a = 10;};', '}', 'enddo;']
+        postfix, marks, report = self.optimize(lines)
+        self.assertEquals(report[1:], [['thread jump', 'mark_3 jump', 'mark_0 jump']])
+        self.assertEquals(to_string(postfix),
+                          'a 0 = a 10 < mark_1 jump_on_False a mark_2 jump_on_False a a 1 + = mark_0 jump '
+                          'a 10 = mark_0 jump')
+        self.assertEquals(sorted(marks.values()), [3, 18, 23])
+        executor = PostfixExecutor()
+        executor.get_output(postfix)
+        self.assertEquals(executor.variables, {'a': 10})
+
+    def test3(self):
+        postfix, marks, report = self.optimize(['a = -10 * 2;', 'if 1 then {a = 1;} else {a = 2;};'], enabled=False)
+        self.assertEquals(to_string(postfix), 'a 10 @ 2 * = 1 mark_0 jump_on_False a 1 = mark_1 jump a 2 =')
+        self.assertEquals(len(marks), 2)
+        self.assertEquals(report, [['action', 'removed', 'result']])
+
+    def test4(self):
+        postfix, marks, report = self.optimize(['a = 2; b = 3;',
+                                                'x = a * b + 1; y = a * b + 1; z = a * b; a = 1; w = a * b;'])
+        self.assertEquals(to_string(postfix),
+                          'a 2 = b 3 = $t0 a b * = $t1 $t0 1 + = x $t1 = y $t1 = z $t0 = a 1 = w a b * =')
+        self.assertEquals(report[1:], [['common subexpression', 'a b *', '$t0'],
+                                       ['common subexpression', '$t0 1 +', '$t1']])
+        executor = PostfixExecutor()
+        executor.get_output(postfix)
+        self.assertEquals(executor.variables, {'a': 1, 'b': 3, 'x': 7, 'y': 7, 'z': 6, 'w': 3})
+
+    def test5(self):
+        postfix, marks, report = self.optimize(['a = 2; b = 3; i = 0;',
+                                                'while i < 3 do {c = a * b - i; i = i + 1; write i * (a + b);} enddo;'])
+        self.assertEquals(to_string(postfix),
+                          'a 2 = b 3 = i 0 = i 3 < mark_0 jump_on_False $t0 a b * = i 3 < mark_1 jump_on_False '
+                          'c $t0 i - = i i 1 + = i a b + * write mark_0 jump')
+        self.assertEquals(report[1:], [['loop invariant', 'a b *', '$t0']])
+        output = []
+        executor = PostfixExecutor()
+        executor.get_output(postfix, output_function=output.append)
+        self.assertEquals(output, [5, 10, 15])
+        self.assertEquals(executor.variables, {'a': 2, 'b': 3, 'i': 3, 'c': 4})
+
+    def test6(self):
+        postfix, marks, report = self.optimize(['i = 0;', 'while i < 3 do {write a * 2; i = i + 1;} enddo;'])
+        self.assertEquals(to_string(postfix), 'i 0 = i 3 < mark_1 jump_on_False a 2 * write i i 1 + = mark_0 jump')
+        postfix, marks, report = self.optimize(['read a; b = c; i = 0;',
+                                                'while i < 3 do {write a * 2 + b; i = i + 1;} enddo;'])
+        self.assertEquals(report[1:], [['loop invariant', 'a 2 *', '$t0']])
+
+    def test7(self):
+        lines = ['a = 2; b = 3;', 'x = a * b; y = a * b;']
+        postfix, marks, report = self.optimize(lines)
+        self.assertEquals(to_string(postfix), 'a 2 = b 3 = $t0 a b * = x $t0 = y $t0 =')
+        postfix, marks = self.translator.get_postfix_matches(self.combiner.lexical_analyzer.get_lexemes(lines))
+        postfix, marks, report = PostfixOptimizer(dataflow=False).optimize(postfix, marks)
+        self.assertEquals(to_string(postfix), 'a 2 = b 3 = x a b * = y a b * =')
+
+    def test8(self):
+        lines = ['write (3 * 4); write 1.50 * 2; write -1.50; write +2; write 1.50;']
+        for enabled in (True, False):
+            postfix, _, _ = self.optimize(lines, enabled)
+            outputs = []
+            PostfixExecutor().get_output(postfix, output_function=outputs.append)
+            self.assertEquals(outputs, [12, 3.0, -1.5, 2, '1.50'])
+            outputs = []
+            BytecodeExecutor().get_output(BytecodeGenerator().get_program(postfix), outputs.append)
+            self.assertEquals(outputs, [12, 3.0, -1.5, 2, '1.50'])
+            outputs = []
+            PythonExecutor().get_output(PythonGenerator().get_program(postfix), outputs.append)
+            self.assertEquals(outputs, [12, 3.0, -1.5, 2, '1.50'])
+
+    def test9(self):
+        sources = [['a = 1; b = 10 ^ 400;', 'while a < 0 do {c = b * 1.5;} enddo; write 5;'],
+                   ['a = 1; b = 10 ^ 400; i = 0;', 'while i < 0 do {write i; c = b * 1.5; i = i + 1;} enddo; write 5;'],
+                   ['a = 1;', 'while a < 0 do {write 3 > (-1) ^ .5;} enddo; write 5;']]
+        for lines in sources:
+            for enabled in (True, False):
+                postfix, _, _ = self.optimize(lines, enabled)
+                outputs = []
+                PostfixExecutor().get_output(postfix, output_function=outputs.append)
+                self.assertEquals(outputs, ['5'])
+                outputs = []
+                BytecodeExecutor().get_output(BytecodeGenerator().get_program(postfix), outputs.append)
+                self.assertEquals(outputs, ['5'])
+                outputs = []
+                PythonExecutor().get_output(PythonGenerator().get_program(postfix), outputs.append)
+                self.assertEquals(outputs, ['5'])
+        postfix, _, report = self.optimize(['b = 1.5; i = 0;', 'while i < 2 do {c = b * 2.5 + i; i = i + 1;} enddo;'])
+        self.assertEquals(to_string(postfix), 'b 1.5 = i 0 = i 2 < mark_0 jump_on_False $t0 b 2.5 * = i 2 < '
+                                              'mark_1 jump_on_False c $t0 i + = i i 1 + = mark_0 jump')
+        self.assertEquals(report[1:], [['loop invariant', 'b 2.5 *', '$t0']])
+
+
+class BytecodeExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.combiner = _Combiner('statement_list')
+        self.translator = SyntaxDirectedTranslator(self.combiner.syntax_analyzer)
+        self.executor = BytecodeExecutor()
+        self.output = []
+
+    def run_program(self, lines):
+        postfix, _ = self.translator.get_postfix_matches(self.combiner.lexical_analyzer.get_lexemes(lines))
+        program = BytecodeGenerator().get_program(postfix)
+        return self.executor.get_output(program, self.output_function)
+
+    def output_function(self, text='', mode='output', next_compiler_position=None):
+        self.output.append(text if mode == 'output' else ('input', next_compiler_position))
+
+    def test0(self):
+        finished = self.run_program(['a = 1.50; b = -a ^ 2; i = 0;',
+                                     'while i < 3 do {i = i + 1; write i * 2;} enddo;', 'write a; write 1.50;'])
+        self.assertEquals(finished, True)
+        self.assertEquals(self.output, [2, 4, 6, 1.5, '1.50'])
+        self.assertEquals(self.executor.variables, {'a': 1.5, 'b': 2.25, 'i': 3})
+
+    def test1(self):
+        finished = self.run_program(['a = 2;', 'read b;', 'write a * b;'])
+        self.assertEquals(finished, False)
+        self.assertEquals(self.output, [('input', 3)])
+        self.assertEquals(self.executor.variables, {'a': 2})
+        finished = self.executor.get_output(self.executor.program, self.output_function, 5.0, 3)
+        self.assertEquals(finished, True)
+        self.assertEquals(self.output, [('input', 3), 10.0])
+        self.assertEquals(self.executor.variables, {'a': 2, 'b': 5.0})
+        steps = self.executor.run(self.executor.program)
+        self.assertEquals(next(steps), ('input', 3))
+        self.assertEquals(self.executor.variables, {'a': 2, 'b': 5.0})
+        self.assertEquals(steps.send(7.0), ('output', 14.0))
+        self.assertEquals(self.executor.variables, {'a': 2, 'b': 7.0})
+        steps.close()
+
+    def test2(self):
+        with self.assertRaises(ExecutionError) as context:
+            self.run_program(['a = 1;', 'write a;', 'b = a + c * 2;'])
+        self.assertEquals(self.output, [1])
+        self.assertEquals(context.exception.error_type, 'Name Error')
+        self.assertEquals(context.exception.lexeme.text, 'c')
+        self.assertEquals(context.exception.lexeme.location, (2, 8))
+        with self.assertRaises(ExecutionError) as context:
+            self.run_program(['a = 0;', 'b = 1 / a;'])
+        self.assertEquals(context.exception.message, 'Zero Division')
+        self.assertEquals(context.exception.lexeme.location, (1, 6))
+
+    def test3(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file = FileWrapper(os.path.join(directory, 'program.txt'))
+            FileWrapper.write_file(file.file_path, 'a = 2;\nb = a / (a - 2);\n')
+            compiler = Compiler()
+            compiler.get_output(file, self.output_function, None, 0)
+            self.assertEquals(self.output[0].split('\n')[-1], "Value Error: Zero Division '/'")
+            self.assertEquals(compiler.variables, {'a': 2})
+            self.assertEquals(CSVWrapper.read_csv(file.variables_path).split('\n')[1:], ['a        | 2    '])
+
+    def test4(self):
+        self.run_program(['a = 2; b = 3; i = 0;', 'while i < 2 do {i = i + 1; c = a * b + i;} enddo;'])
+        self.assertEquals(self.executor.program.names, ['a', 'b', 'i', 'c'])
+        self.assertEquals(self.executor.slots, [2, 3, 2, 8])
+        postfix, marks = self.translator.get_postfix_matches(self.combiner.lexical_analyzer.get_lexemes(
+            ['b = 4; i = 0;', 'while i < 2 do {d = b * b + i; i = i + 1;} enddo;', 'write a;']))
+        postfix, marks, _ = PostfixOptimizer().optimize(postfix, marks)
+        self.executor.get_output(BytecodeGenerator().get_program(postfix), self.output_function)
+        self.assertEquals(self.executor.program.names, ['b', 'i', '$t0', 'd', 'a'])
+        self.assertEquals(self.executor.slots, [4, 2, 16, 17, 2])
+        self.assertEquals(self.output, [2])
+        self.assertEquals(self.executor.variables, {'a': 2, 'b': 4, 'i': 2, 'c': 8, 'd': 17})
+
+    def test5(self):
+        postfix, _ = self.translator.get_postfix_matches(self.combiner.lexical_analyzer.get_lexemes(
+            ['a = 2;', 'read b;', 'write a * b; write 1.50;']))
+        steps = self.executor.run(BytecodeGenerator().get_program(postfix))
+        self.assertEquals(next(steps), ('input', 3))
+        self.assertEquals(steps.send(5.0), ('output', 10.0))
+        self.assertEquals(next(steps), ('output', '1.50'))
+        with self.assertRaises(StopIteration):
+            next(steps)
+        self.assertEquals(self.executor.variables, {'a': 2, 'b': 5.0})
+
+    def test6(self):
+        values = iter([2.0, 3.0])
+
+        async def input_function(position):
+            await asyncio.sleep(0)
+            return next(values)
+
+        with tempfile.TemporaryDirectory() as directory:
+            file = FileWrapper(os.path.join(directory, 'program.txt'))
+            FileWrapper.write_file(file.file_path, 'read a; read b;\nwrite a * b; write 1 / (a - 2);\n')
+            compiler = Compiler()
+            asyncio.run(compiler.get_output_async(file, self.output_function, input_function))
+            self.assertEquals(self.output[0], 6.0)
+            self.assertEquals(self.output[1].split('\n')[-1], "Value Error: Zero Division '/'")
+            self.assertEquals(compiler.variables, {'a': 2.0, 'b': 3.0})
+
+    def test7(self):
+        sources = [('a = 2; write (-a) ^ 2; write (-8) ^ (1/3);', [4], "Value Error: Math Domain '^'"),
+                   ('a = -1; write a ^ .5 > 1;', [], "Value Error: Math Domain '^'"),
+                   ('a = 10.0; write a ^ 2; b = a ^ 400;', [100.0], "Value Error: Overflow '^'"),
+                   ('a = 0; write a ^ -1;', [], "Value Error: Zero Division '^'")]
+        with tempfile.TemporaryDirectory() as directory:
+            file = FileWrapper(os.path.join(directory, 'program.txt'))
+            for source, outputs, error in sources:
+                FileWrapper.write_file(file.file_path, source)
+                for backend in ('bytecode', 'python'):
+                    for optimize in (False, True):
+                        self.output = []
+                        Compiler(backend=backend, optimize=optimize).get_output(file, self.output_function, None, 0)
+                        self.assertEquals(self.output[:-1], outputs)
+                        self.assertEquals(self.output[-1].split('\n')[-1], error)
+
+
+class PythonBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.combiner = _Combiner('statement_list')
+        self.translator = SyntaxDirectedTranslator(self.combiner.syntax_analyzer)
+        self.executor = PythonExecutor()
+        self.output = []
+
+    def get_program(self, lines, optimize=False):
+        postfix, marks = self.translator.get_postfix_matches(self.combiner.lexical_analyzer.get_lexemes(lines))
+        if optimize:
+            postfix, marks, _ = PostfixOptimizer().optimize(postfix, marks)
+        return PythonGenerator().get_program(postfix)
+
+    def output_function(self, text='', mode='output', next_compiler_position=None):
+        self.output.append(text if mode == 'output' else ('input', next_compiler_position))
+
+    def test0(self):
+        program = self.get_program(['a = 10; read b;', 'if a == 10 then {c = a + b; while c > 0 do {write 5 * c;',
+                                    'c = c - 1;} enddo;} else {c = a - b; write c;};'], optimize=True)
+        self.assertEquals(program.structured, True)
+        self.assertEquals(program.source.split('\n')[7:18], ['    v_a = 10',
+                                                              "    v_b = yield 'input', 1",
+                                                              '    if (v_a == 10):',
+                                                              '        v_c = (v_a + v_b)',
+                                                              '        while (v_c > 0):',
+                                                              '            write((5 * v_c))',
+                                                              '            v_c = (v_c - 1)',
+                                                              '    else:',
+                                                              '        v_c = (v_a - v_b)',
+                                                              '        write(v_c)',
+                                                              '    return locals()'])
+
+    def test1(self):
+        program = self.get_program(['a = 1.50; b = -a ^ 2; read i;', 'while i < 3 do {i = i + 1; write i * 2;} enddo;',
+                                    'write a; write 1.50;'])
+        self.assertEquals(self.executor.get_output(program, self.output_function), False)
+        self.assertEquals(self.output, [('input', 1)])
+        self.assertEquals(self.executor.get_output(program, self.output_function, 1.0, 1), True)
+        self.assertEquals(self.output, [('input', 1), 4.0, 6.0, 1.5, '1.50'])
+        self.assertEquals(self.executor.variables, {'a': 1.5, 'b': 2.25, 'i': 3.0})
+
+    def test2(self):
+        with self.assertRaises(ExecutionError) as context:
+            self.executor.get_output(self.get_program(['a = 1;', 'write a;', 'b = a + c * 2;']), self.output_function)
+        self.assertEquals(self.output, [1])
+        self.assertEquals(context.exception.error_type, 'Name Error')
+        self.assertEquals(context.exception.lexeme.location, (2, 8))
+        self.assertEquals(self.executor.variables, {'a': 1})
+        with self.assertRaises(ExecutionError) as context:
+            self.executor.get_output(self.get_program(['a = 0;', 'b = 1 / a;']), self.output_function)
+        self.assertEquals(context.exception.message, 'Zero Division')
+        self.assertEquals(context.exception.lexeme.location, (1, 6))
+
+    def test3(self):
+        class BlockGenerator(PythonGenerator):
+            def _add_range(self, *arguments):
+                raise _StructureError()
+
+        lines = ['i = 0;', 'while i < 3 do {if i == 1 then {write i;} else {write 0;}; i = i + 1;} enddo;']
+        postfix, _ = self.translator.get_postfix_matches(self.combiner.lexical_analyzer.get_lexemes(lines))
+        program = BlockGenerator().get_program(postfix)
+        self.assertEquals(program.structured, False)
+        self.assertEquals(program.source.split('\n')[3:5], ['    label = 0', '    while True:'])
+        self.assertEquals(self.executor.get_output(program, self.output_function), True)
+        self.assertEquals(self.output, ['0', 1, '0'])
+        self.assertEquals(self.executor.variables, {'i': 3})
+
+    def test4(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file = FileWrapper(os.path.join(directory, 'program.txt'))
+            FileWrapper.write_file(file.file_path, 'a = 2; read b;\nwrite a * b;\n')
+            compiler = Compiler(backend='python')
+            compiler.get_output(file, self.output_function, None, 0)
+            compiler.get_output(file, self.output_function, 4.0, 1)
+            self.assertEquals(self.output, [('input', 1), 8.0])
+            self.assertEquals(compiler.variables, {'a': 2, 'b': 4.0})
+            namespace = dict()
+            exec(FileWrapper.read_file(file.python_path), namespace)
+            output = []
+            steps = namespace['program'](dict(), output.append)
+            next(steps)
+            with self.assertRaises(StopIteration):
+                steps.send(1.5)
+            self.assertEquals(output, [3.0])
+
+    def test5(self):
+        steps = self.executor.run(self.get_program(['write 1; read a;', 'write a; c = a - a;', 'write 1 / c;']))
+        self.assertEquals(next(steps), ('output', '1'))
+        self.assertEquals(next(steps), ('input', 1))
+        self.assertEquals(steps.send(2.0), ('output', 2.0))
+        with self.assertRaises(ExecutionError) as context:
+            next(steps)
+        self.assertEquals(context.exception.lexeme.location, (2, 8))
+        self.assertEquals(self.executor.variables, {'a': 2.0, 'c': 0.0})
+
+    def test6(self):
+        program = self.get_program(['a = 1;', 'if a == 1 then {' * 200 + 'write a;' + '} else {};' * 200])
+        self.assertEquals(program.structured, False)
+        self.assertEquals(self.executor.get_output(program, self.output_function), True)
+        program = self.get_program(['a = 1;', 'b = ' + '(' * 300 + 'a' + ' + a)' * 300 + ' + a / (a - 1);'])
+        self.assertEquals(program.structured, True)
+        with self.assertRaises(ExecutionError) as context:
+            self.executor.get_output(program, self.output_function)
+        self.assertEquals(context.exception.lexeme.location, (1, 1810))
+        self.assertEquals(self.executor.get_output(self.get_program(['b = a' + ' - a' * 3000 + ';']),
+                                                   self.output_function), True)
+        self.assertEquals(self.output, [1])
+        self.assertEquals(self.executor.variables, {'a': 1, 'b': -2999})
+
+    def test7(self):
+        steps = self.executor.run(self.get_program(['i = 0;', 'while 1 do {write i * 2; i = i + 1;} enddo;']))
+        self.assertEquals([next(steps), next(steps), next(steps)], [('output', 0), ('output', 2), ('output', 4)])
+        steps.close()
+
+
+class InputProviderTest(unittest.TestCase):
+    def setUp(self):
+        self.output = []
+
+    def output_function(self, text='', mode='output', next_compiler_position=None):
+        self.output.append(text if mode == 'output' else ('input', next_compiler_position))
+
+    def test0(self):
+        provider = StreamInputProvider(io.StringIO('1.5 20\n-3,4e2\n\n  7'), buffer_size=3)
+        self.assertEquals([provider.get_value() for _ in range(5)], [1.5, 20.0, -3.0, 400.0, 7.0])
+        with self.assertRaises(EOFError):
+            provider.get_value()
+        provider = ListInputProvider(['2', 3])
+        self.assertEquals([provider.get_value(), provider.get_value()], [2.0, 3.0])
+        with self.assertRaises(EOFError):
+            provider.get_value()
+
+    def test1(self):
+        combiner = _Combiner('statement_list')
+        combiner.executor = PostfixExecutor(input_provider=ListInputProvider([4, 5]))
+        postfix, _ = SyntaxDirectedTranslator(combiner.syntax_analyzer).get_postfix_matches(
+            combiner.lexical_analyzer.get_lexemes(['read a; i = 0;', 'while i < a do {i = i + 1;} enddo;', 'read b;']))
+        combiner.executor.get_output(postfix, output_function=self.output_function)
+        self.assertEquals(self.output, [])
+        self.assertEquals(combiner.variables, {'a': 4.0, 'i': 4, 'b': 5.0})
+
+    def test2(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file = FileWrapper(os.path.join(directory, 'program.txt'))
+            FileWrapper.write_file(file.file_path, 's = 0; read n;\nwhile n > 0 do {read a; s = s + a; n = n - 1;} enddo;'
+                                                   '\nwrite s;\n')
+            values_path = os.path.join(directory, 'values.txt')
+            FileWrapper.write_file(values_path, '3\n' + '\n'.join(['1.5'] * 3) + '\n')
+            for backend in ('bytecode', 'python'):
+                with FileInputProvider(values_path, buffer_size=4) as provider:
+                    compiler = Compiler(backend=backend, input_provider=provider)
+                    compiler.get_output(file, self.output_function, None, 0)
+                self.assertEquals(compiler.variables, {'s': 4.5, 'n': 0.0, 'a': 1.5})
+            self.assertEquals(self.output, [4.5, 4.5])
+
+    def test3(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file = FileWrapper(os.path.join(directory, 'program.txt'))
+            FileWrapper.write_file(file.file_path, 'read a;\nwrite a;\n  read b;\n')
+            for backend in ('bytecode', 'python'):
+                self.output = []
+                compiler = Compiler(backend=backend, input_provider=ListInputProvider([2]))
+                compiler.get_output(file, self.output_function, None, 0)
+                self.assertEquals(self.output[0], 2.0)
+                self.assertEquals(self.output[1].split('\n')[2:], ['Line 2, column 2', '  read b;',
+                                                                   "Input Error: No input value 'read'"])
+                self.assertEquals(compiler.variables, {'a': 2.0})
+                self.assertEquals(CSVWrapper.read_csv(file.variables_path).split('\n')[1:], ['a        | 2.0  '])
+
+    def test4(self):
+        provider = StreamInputProvider(io.StringIO('1 abc 2'), buffer_size=3)
+        self.assertEquals(provider.get_value(), 1.0)
+        with self.assertRaises(ValueError):
+            provider.get_value()
+        with tempfile.TemporaryDirectory() as directory:
+            file = FileWrapper(os.path.join(directory, 'program.txt'))
+            FileWrapper.write_file(file.file_path, 'read a;\nwrite a;\n  read b;\n')
+            values_path = os.path.join(directory, 'values.txt')
+            FileWrapper.write_file(values_path, '2 abc\n')
+            for backend in ('bytecode', 'python'):
+                self.output = []
+                with FileInputProvider(values_path) as provider:
+                    compiler = Compiler(backend=backend, input_provider=provider)
+                    compiler.get_output(file, self.output_function, None, 0)
+                self.assertEquals(self.output[0], 2.0)
+                self.assertEquals(self.output[1].split('\n')[2:], ['Line 2, column 2', '  read b;',
+                                                                   "Input Error: Invalid input value 'read'"])
+                self.assertEquals(compiler.variables, {'a': 2.0})
+                self.assertEquals(CSVWrapper.read_csv(file.variables_path).split('\n')[1:], ['a        | 2.0  '])
@@ -0,0 +1,624 @@
+import sys
+from common import terminal_lexemes, type_terminal_numbers
+from lexical_analysis import Lexeme
+from postfix_transformation import PostfixMark, PostfixJump, get_operator_value, temporary_prefix
+from syntax_analysis import TerminalMatch, SimpleSymbol
+
+binary_operators = {'+', '-', '*', '/', '^', '==', '!=', '<>', '>', '<', '>=', '<='}
+unary_operators = {'@', '+_'}
+safe_operators = {'+', '-', '*', '==', '!=', '<>', '>', '<', '>=', '<=', '@', '+_'}
+infallible_operators = {'==', '!=', '<>', '>', '<', '>=', '<=', '@', '+_'}
+integer_operators = {'+', '-', '*'}
+
+_identifier_symbol = SimpleSymbol('identifier')
+_assignment_symbol = SimpleSymbol('=')
+_assignment_symbol.name = 'assignment_operator'
+
+
+class _Label(object):
+    def __init__(self, mark):
+        self.mark = mark
+
+    def __str__(self):
+        return '%s:' % self.mark
+
+    __repr__ = __str__
+
+
+def _to_string(elements):
+    return ' '.join([str(element) for element in elements if type(element) != _Label])
+
+
+def _is_constant(element):
+    return type(element) == TerminalMatch and element.symbol.name == 'constant'
+
+
+def _is_float_integer(node):
+    if node.children or not _is_constant(node.element):
+        return False
+    value = node.element.lexeme.value
+    return type(value) == int and abs(value) <= sys.float_info.max
+
+
+def _get_operator_text(element):
+    if type(element) == TerminalMatch and element.symbol.name not in ('constant', 'identifier'):
+        return element.lexeme.text
+    return None
+
+
+class _Node(object):
+    def __init__(self, element, number, children=(), names=frozenset(), safe=True, infallible=True):
+        self.element = element
+        self.number = number
+        self.children = list(children)
+        self.names = names
+        self.safe = safe
+        self.infallible = infallible
+
+    def get_elements(self):
+        elements = []
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            elements.append(node.element)
+            pending.extend(node.children)
+        elements.reverse()
+        return elements
+
+
+class _Statement(object):
+    def __init__(self, target, expression, tail):
+        self.target = target
+        self.expression = expression
+        self.tail = tail
+
+    @property
+    def assigned(self):
+        if self.target is not None:
+            return self.target.element.lexeme.text
+        return None
+
+    @property
+    def jump(self):
+        if type(self.tail[-1]) == PostfixJump:
+            return self.tail[-1]
+        return None
+
+    def get_elements(self):
+        elements = []
+        for node in [self.target, self.expression]:
+            if node is not None:
+                elements.extend(node.get_elements())
+        return elements + self.tail
+
+
+class PostfixOptimizer(object):
+    def __init__(self, enabled=True, dataflow=True):
+        self.enabled = enabled
+        self.dataflow = dataflow
+
+    def optimize(self, postfix_ordered, marks):
+        report = [['action', 'removed', 'result']]
+        if not self.enabled:
+            return postfix_ordered, marks, report
+        elements = self._get_labeled_elements(postfix_ordered)
+        changed = True
+        while changed:
+            changed = False
+            for optimization in [self._fold_constants, self._drop_constant_branches, self._thread_jumps,
+                                 self._drop_unreachable_code, self._drop_jumps_to_next]:
+                elements, optimization_changed = optimization(elements, report)
+                changed = changed or optimization_changed
+        if self.dataflow:
+            elements = DataflowOptimizer().optimize(elements, report)
+        return self._get_postfix(elements, marks) + (report,)
+
+    @staticmethod
+    def _get_labeled_elements(postfix_ordered):
+        labels = dict()
+        for element in postfix_ordered:
+            if type(element) == PostfixJump and element.mark not in labels:
+                labels[element.mark] = _Label(element.mark)
+        labels_by_position = dict()
+        for mark, label in labels.items():
+            if mark.start_position is None:
+                raise ValueError('Mark %s has no position' % mark)
+            labels_by_position.setdefault(mark.start_position, []).append(label)
+        elements = []
+        for position, element in enumerate(postfix_ordered):
+            elements.extend(labels_by_position.get(position, []))
+            elements.append(element)
+        elements.extend(labels_by_position.get(len(postfix_ordered), []))
+        return elements
+
+    @staticmethod
+    def _get_postfix(elements, marks):
+        postfix_ordered = []
+        positions = dict()
+        for element in elements:
+            if type(element) == _Label:
+                positions[element.mark] = len(postfix_ordered)
+            else:
+                postfix_ordered.append(element)
+        used_marks = {element.mark for element in postfix_ordered if type(element) == PostfixJump}
+        optimized_marks = dict()
+        for mark in marks:
+            if mark in used_marks:
+                mark.start_position = positions[mark]
+                optimized_marks[mark] = mark.start_position
+        return postfix_ordered, optimized_marks
+
+    @staticmethod
+    def _get_constant(value, match):
+        try:
+            text = str(value)
+        except ValueError:
+            return None
+        lexeme = Lexeme(text, 'constant', match.lexeme.location, match.lexeme.terminal_number, value=value,
+                        folded=True)
+        return TerminalMatch(match.symbol, lexeme)
+
+    def _fold_binary(self, a, b, operator_text):
+        if operator_text == '/' and b.lexeme.value == 0:
+            return None
+        try:
+            value = get_operator_value(operator_text, a.lexeme.value, b.lexeme.value)
+        except Exception:
+            return None
+        return self._get_constant(value, a)
+
+    def _fold_constants(self, elements, report):
+        output = []
+        changed = False
+        for element in elements:
+            operator_text = _get_operator_text(element)
+            if operator_text in binary_operators and len(output) > 1 \
+                    and _is_constant(output[-2]) and _is_constant(output[-1]):
+                folded = self._fold_binary(output[-2], output[-1], operator_text)
+                if folded is not None:
+                    report.append(['fold', _to_string(output[-2:] + [element]), str(folded)])
+                    output[-2:] = [folded]
+                    changed = True
+                    continue
+            elif operator_text == '@' and output and _is_constant(output[-1]):
+                folded = self._get_constant(-output[-1].lexeme.value, output[-1])
+                if folded is not None:
+                    report.append(['fold unary', _to_string([output[-1], element]), str(folded)])
+                    output[-1] = folded
+                    changed = True
+                    continue
+            elif operator_text == '+_' and output and _is_constant(output[-1]):
+                folded = self._get_constant(output[-1].lexeme.value, output[-1])
+                if folded is not None:
+                    report.append(['fold unary', _to_string([output[-1], element]), str(folded)])
+                    output[-1] = folded
+                    changed = True
+                    continue
+            output.append(element)
+        return output, changed
+
+    @staticmethod
+    def _drop_constant_branches(elements, report):
+        output = []
+        changed = False
+        for element in elements:
+            if type(element) == PostfixJump and element.name == 'jump_on_False' and len(output) > 1 \
+                    and type(output[-1]) == PostfixMark and _is_constant(output[-2]):
+                condition = output[-2]
+                removed = _to_string(output[-2:] + [element])
+                if condition.lexeme.value:
+                    del output[-2:]
+                    report.append(['constant branch', removed, ''])
+                else:
+                    del output[-2]
+                    element = PostfixJump(name='jump', mark=element.mark)
+                    report.append(['constant branch', removed, _to_string([output[-1], element])])
+                changed = True
+                if condition.lexeme.value:
+                    continue
+            output.append(element)
+        return output, changed
+
+    @staticmethod
+    def _get_label_indexes(elements):
+        return {element.mark: index for index, element in enumerate(elements) if type(element) == _Label}
+
+    @staticmethod
+    def _get_next_instructions(elements):
+        next_instructions = [None] * (len(elements) + 1)
+        for index in range(len(elements) - 1, -1, -1):
+            if type(elements[index]) in (_Label, PostfixMark):
+                next_instructions[index] = next_instructions[index + 1]
+            else:
+                next_instructions[index] = index
+        return next_instructions
+
+    @staticmethod
+    def _get_jump_target(elements, label_indexes, next_instructions, mark, targets):
+        chain = [mark]
+        visited = {mark}
+        while mark not in targets:
+            index = next_instructions[label_indexes[mark]]
+            target = elements[index] if index is not None else None
+            if type(target) != PostfixJump or target.name != 'jump' or target.mark in visited:
+                break
+            mark = target.mark
+            chain.append(mark)
+            visited.add(mark)
+        mark = targets.get(mark, mark)
+        for chained_mark in chain:
+            targets[chained_mark] = mark
+        return mark
+
+    def _thread_jumps(self, elements, report):
+        label_indexes = self._get_label_indexes(elements)
+        next_instructions = self._get_next_instructions(elements)
+        targets = dict()
+        changed = False
+        for index, element in enumerate(elements):
+            if type(element) != PostfixJump:
+                continue
+            mark = self._get_jump_target(elements, label_indexes, next_instructions, element.mark, targets)
+            if mark is not element.mark:
+                threaded = PostfixJump(name=element.name, mark=mark)
+                report.append(['thread jump', '%s %s' % (element.mark, element), '%s %s' % (mark, threaded)])
+                if index > 0 and elements[index - 1] is element.mark:
+                    elements[index - 1] = mark
+                elements[index] = threaded
+                changed = True
+        return elements, changed
+
+    def _drop_unreachable_code(self, elements, report):
+        label_indexes = self._get_label_indexes(elements)
+        reachable = [False] * len(elements)
+        pending = [0]
+        while pending:
+            index = pending.pop()
+            while index < len(elements) and not reachable[index]:
+                reachable[index] = True
+                element = elements[index]
+                if type(element) == PostfixJump:
+                    pending.append(label_indexes[element.mark])
+                    if element.name == 'jump':
+                        break
+                index += 1
+        output = []
+        removed = []
+        for element, is_reachable in zip(elements, reachable):
+            if is_reachable or type(element) == _Label:
+                if removed:
+                    report.append(['unreachable code', _to_string(removed), ''])
+                    removed = []
+                output.append(element)
+            else:
+                removed.append(element)
+        if removed:
+            report.append(['unreachable code', _to_string(removed), ''])
+        return output, len(output) != len(elements)
+
+    def _drop_jumps_to_next(self, elements, report):
+        label_indexes = self._get_label_indexes(elements)
+        output = []
+        changed = False
+        for index, element in enumerate(elements):
+            if type(element) == PostfixJump and element.name == 'jump' \
+                    and all(type(skipped) in (_Label, PostfixMark)
+                            for skipped in elements[index + 1:label_indexes[element.mark]]) \
+                    and label_indexes[element.mark] > index:
+                removed = [element]
+                if output and output[-1] is element.mark:
+                    removed.insert(0, output.pop())
+                report.append(['jump to next', _to_string(removed), ''])
+                changed = True
+                continue
+            output.append(element)
+        return output, changed
+
+
+class DataflowOptimizer(object):
+    def __init__(self):
+        self._numbers = dict()
+        self._temporary_count = 0
+
+    def optimize(self, elements, report):
+        items = self._get_items(elements)
+        if items is None:
+            return elements
+        for mark in self._get_loop_marks(items):
+            items = self._hoist_loop_invariants(items, mark, report)
+        items = self._eliminate_common_subexpressions(items, report)
+        elements = []
+        for item in items:
+            elements.extend(item.get_elements() if type(item) == _Statement else [item])
+        return elements
+
+    def _get_node(self, element, children=()):
+        if children:
+            operator_text = _get_operator_text(element)
+            key = (operator_text,) + tuple(child.number for child in children)
+            names = frozenset().union(*[child.names for child in children])
+            safe = operator_text in safe_operators and all(child.safe for child in children)
+            infallible = all(child.infallible for child in children) and (
+                operator_text in infallible_operators
+                or operator_text in integer_operators and any(_is_float_integer(child) for child in children))
+        else:
+            key = (element.symbol.name, element.lexeme.text)
+            names = frozenset([element.lexeme.text]) if element.symbol.name == 'identifier' else frozenset()
+            safe = infallible = True
+        number = self._numbers.setdefault(key, len(self._numbers))
+        return _Node(element, number, children, names, safe, infallible)
+
+    def _get_items(self, elements):
+        items = []
+        operands = []
+        tail = []
+        for element in elements:
+            if type(element) == _Label:
+                if operands or tail:
+                    return None
+                items.append(element)
+            elif type(element) == PostfixMark:
+                tail.append(element)
+            elif type(element) == PostfixJump:
+                expression = None
+                if element.name == 'jump_on_False':
+                    if len(operands) != 1:
+                        return None
+                    expression = operands.pop()
+                if operands:
+                    return None
+                items.append(_Statement(None, expression, tail + [element]))
+                tail = []
+            elif tail:
+                return None
+            elif element.symbol.name in ('constant', 'identifier'):
+                operands.append(self._get_node(element))
+            elif element.symbol.name == 'assignment_operator':
+                if len(operands) != 2 or operands[0].children or not operands[0].names:
+                    return None
+                items.append(_Statement(operands[0], operands[1], [element]))
+                operands = []
+            elif element.symbol.name in ('write', 'read'):
+                if len(operands) != 1:
+                    return None
+                if element.symbol.name == 'write':
+                    items.append(_Statement(None, operands.pop(), [element]))
+                elif operands[0].children or not operands[0].names:
+                    return None
+                else:
+                    items.append(_Statement(operands.pop(), None, [element]))
+            else:
+                arity = 1 if _get_operator_text(element) in unary_operators else 2
+                if len(operands) < arity:
+                    return None
+                children = operands[-arity:]
+                del operands[-arity:]
+                operands.append(self._get_node(element, children))
+        if operands or tail:
+            return None
+        return items
+
+    @staticmethod
+    def _get_blocks(items):
+        blocks = []
+        for index, item in enumerate(items):
+            if not blocks or type(item) == _Label or type(items[index - 1]) == _Statement and items[index - 1].jump:
+                blocks.append([])
+            blocks[-1].append(index)
+        return blocks
+
+    def _get_defined_names(self, items):
+        blocks = self._get_blocks(items)
+        label_blocks = {items[block[0]].mark: number for number, block in enumerate(blocks)
+                        if type(items[block[0]]) == _Label}
+        predecessors = [[] for _ in blocks]
+        for number, block in enumerate(blocks):
+            last = items[block[-1]]
+            jump = last.jump if type(last) == _Statement else None
+            if jump is not None:
+                predecessors[label_blocks[jump.mark]].append(number)
+            if (jump is None or jump.name != 'jump') and number + 1 < len(blocks):
+                predecessors[number + 1].append(number)
+        outputs = [None] * len(blocks)
+        defined_names = [None] * len(items)
+        changed = True
+        while changed:
+            changed = False
+            for number, block in enumerate(blocks):
+                defined = set() if number == 0 else None
+                for predecessor in predecessors[number]:
+                    if outputs[predecessor] is not None:
+                        defined = set(outputs[predecessor]) if defined is None else defined & outputs[predecessor]
+                for index in block:
+                    defined_names[index] = defined
+                    defined = self._get_defined_after(items[index], defined)
+                if defined != outputs[number]:
+                    outputs[number] = defined
+                    changed = True
+        return defined_names
+
+    @staticmethod
+    def _get_defined_after(item, defined):
+        if defined is None or type(item) != _Statement or not item.assigned:
+            return defined
+        names = item.expression.names if item.expression is not None else frozenset()
+        if all(name in defined or name.startswith(temporary_prefix) for name in names):
+            return defined | {item.assigned}
+        return defined - {item.assigned}
+
+    @staticmethod
+    def _is_defined(node, defined):
+        return defined is None or all(name in defined or name.startswith(temporary_prefix) for name in node.names)
+
+    def _is_computable(self, node, defined):
+        if not node.children or not node.safe:
+            return False
+        return self._is_defined(node, defined)
+
+    def _add_temporary(self, node):
+        name = '%st%s' % (temporary_prefix, self._temporary_count)
+        self._temporary_count += 1
+        lexeme = node.element.lexeme
+        target = self._get_node(TerminalMatch(_identifier_symbol, Lexeme(
+            name, 'identifier', lexeme.location, type_terminal_numbers['identifier'])))
+        assignment = TerminalMatch(_assignment_symbol, Lexeme(
+            '=', 'terminal', lexeme.location, terminal_lexemes['=']))
+        return _Statement(target, node, [assignment])
+
+    def _rewrite(self, node, replace, define=None):
+        results = []
+        pending = [(node, False)]
+        while pending:
+            node, visited = pending.pop()
+            if not visited:
+                replacement = replace(node)
+                if replacement is not None:
+                    results.append(replacement)
+                elif node.children:
+                    pending.append((node, True))
+                    pending.extend((child, False) for child in reversed(node.children))
+                else:
+                    results.append(node)
+                continue
+            children = results[len(results) - len(node.children):]
+            del results[len(results) - len(node.children):]
+            rewritten = self._get_node(node.element, children)
+            results.append(define(node, rewritten) if define else rewritten)
+        return results[0]
+
+    @staticmethod
+    def _get_loop_marks(items):
+        label_indexes = dict()
+        loop_marks = []
+        for index, item in enumerate(items):
+            if type(item) == _Label:
+                label_indexes[item.mark] = index
+            elif type(item) == _Statement and item.jump and item.jump.mark in label_indexes \
+                    and item.jump.mark not in loop_marks:
+                loop_marks.append(item.jump.mark)
+        return sorted(loop_marks, key=lambda mark: label_indexes[mark])
+
+    @staticmethod
+    def _get_loop_condition(items, start, region_marks):
+        item = items[start + 1]
+        if type(item) == _Statement and item.jump and item.jump.name == 'jump_on_False' \
+                and item.jump.mark not in region_marks:
+            return item
+        return None
+
+    @staticmethod
+    def _get_entry_sections(items, start, end, condition):
+        sections = dict()
+        if condition is not None:
+            sections[id(condition)] = 'condition'
+        first = start + (2 if condition is not None else 1)
+        if first <= end and type(items[first]) == _Statement and items[first].expression is not None:
+            sections[id(items[first])] = 'body'
+        return sections
+
+    def _hoist_loop_invariants(self, items, mark, report):
+        start = next(index for index, item in enumerate(items) if type(item) == _Label and item.mark is mark)
+        end = max(index for index, item in enumerate(items)
+                  if type(item) == _Statement and item.jump and item.jump.mark is mark)
+        region_marks = {item.mark for item in items[start:end + 1] if type(item) == _Label}
+        for index, item in enumerate(items):
+            if (index < start or index > end) and type(item) == _Statement and item.jump \
+                    and item.jump.mark in region_marks:
+                return items
+        defined = self._get_defined_names(items)[start]
+        assigned = {item.assigned for item in items[start:end + 1] if type(item) == _Statement}
+        condition = self._get_loop_condition(items, start, region_marks)
+        sections = self._get_entry_sections(items, start, end, condition)
+        temporaries = dict()
+        preheader = []
+        guarded = []
+        section = [None]
+        blocked = set()
+
+        def replace(node):
+            if not node.children and not self._is_defined(node, defined):
+                blocked.add(section[0])
+            if not self._is_computable(node, defined) or node.names & assigned:
+                return None
+            if not node.infallible and (section[0] is None or section[0] in blocked):
+                return None
+            if node.number not in temporaries:
+                statement = self._add_temporary(node)
+                report.append(['loop invariant', _to_string(node.get_elements()), statement.assigned])
+                temporaries[node.number] = statement.target
+                (guarded if not node.infallible and section[0] == 'body' else preheader).append(statement)
+            return temporaries[node.number]
+
+        def define(node, rewritten):
+            if not node.infallible:
+                blocked.add(section[0])
+            return rewritten
+
+        region = []
+        for item in items[start:end + 1]:
+            if type(item) == _Statement and item.expression is not None:
+                section[0] = sections.get(id(item))
+                rewritten = _Statement(item.target, self._rewrite(item.expression, replace, define), item.tail)
+                if item is condition:
+                    condition = rewritten
+                item = rewritten
+            region.append(item)
+        if guarded and condition is not None:
+            preheader.append(_Statement(None, condition.expression,
+                                        [mark, PostfixJump(name='jump_on_False', mark=mark)]))
+        return items[:start] + preheader + guarded + region + items[end + 1:]
+
+    def _eliminate_common_subexpressions(self, items, report):
+        defined_names = self._get_defined_names(items)
+        output = []
+        for block in self._get_blocks(items):
+            occurrences = self._get_occurrences(items, block, defined_names)
+            temporaries = dict()
+
+            def replace(node):
+                return temporaries.get(id(occurrences.get(id(node))))
+
+            def define(node, rewritten):
+                nodes = occurrences.get(id(node), ())
+                if len(nodes) < 2:
+                    return rewritten
+                statement = self._add_temporary(rewritten)
+                report.append(['common subexpression', _to_string(rewritten.get_elements()), statement.assigned])
+                temporaries[id(nodes)] = statement.target
+                output.append(statement)
+                return statement.target
+
+            for index in block:
+                item = items[index]
+                if type(item) == _Statement and item.expression is not None:
+                    expression = self._rewrite(item.expression, replace, define)
+                    item = _Statement(item.target, expression, item.tail)
+                output.append(item)
+        return output
+
+    def _get_occurrences(self, items, block, defined_names):
+        available = dict()
+        occurrences = dict()
+        for index in block:
+            item = items[index]
+            if type(item) != _Statement:
+                continue
+            if item.expression is not None:
+                pending = [(item.expression, False)]
+                while pending:
+                    node, visited = pending.pop()
+                    if visited:
+                        if self._is_computable(node, defined_names[index]):
+                            available[node.number] = [node]
+                            occurrences[id(node)] = available[node.number]
+                    elif node.number in available:
+                        available[node.number].append(node)
+                        occurrences[id(node)] = available[node.number]
+                    elif node.children:
+                        pending.append((node, True))
+                        pending.extend((child, False) for child in reversed(node.children))
+            if item.assigned:
+                for number, nodes in list(available.items()):
+                    if item.assigned in nodes[0].names:
+                        del available[number]
+        return occurrences
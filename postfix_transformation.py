@@ -1,7 +1,7 @@
+import operator
 from lexical_analysis import Lexeme, AnalysisError
-from syntax_analysis import TerminalMatch
+from syntax_analysis import TerminalMatch, SimpleSymbol
 from file_wrapper import CSVWrapper
-from copy import copy
 
 
 class PostfixMark(object):
@@ -26,34 +26,44 @@ class PostfixJump(object):
     __repr__ = __str__
 
 
+def get_priorities(operators_ordering):
+    priorities = dict()
+    for priority, operators in enumerate(operators_ordering):
+        for operator in operators.split(' '):
+            priorities[operator] = priority
+    return priorities
+
+
 class PostfixProcessor(object):
+    operators_ordering = [
+        '( { if while',
+        ';',
+        'write read enddo',
+        '=',
+        'or',
+        'and',
+        'not',
+        '< > >= <= != <> ==',
+        '+ -',
+        '* /',
+        '^',
+        '@ +_',
+        ','
+    ]
+    unary_operators = {'-': '@', '+': '+_'}
+
     def __init__(self):
-        operators_ordering = [
-            '( { if while',
-            ';',
-            'write read enddo',
-            '=',
-            'or',
-            'and',
-            'not',
-            '< > >= <= != <> ==',
-            '+ -',
-            '* /',
-            '^',
-            '@ +_',
-            ','
-        ]
         self.cycles_operators = {'then': 'if', 'do': 'while'}
-        self._priorities = dict()
-        for priority, operators in enumerate(operators_ordering):
-            for operator in operators.split(' '):
-                self._priorities[operator] = priority
+        self._priorities = get_priorities(self.operators_ordering)
 
         self._output = None
         self._operator_stack = None
         self._dif_output = []
         self._marks = None
         self._execute_from_stack_on_separator = False
+        self._history_writer = None
+        self._history_row = None
+        self._history_step = 0
 
     def _reinitialize(self):
         self._output = list()
@@ -63,10 +73,12 @@ class PostfixProcessor(object):
     def add_to_output(self, element):
         if type(element) == list:
             self._output.extend(element)
-            self._dif_output.extend(element)
+            if self._history_writer is not None:
+                self._dif_output.extend(element)
         else:
             self._output.append(element)
-            self._dif_output.append(element)
+            if self._history_writer is not None:
+                self._dif_output.append(element)
 
     def _get_priority(self, match):
         return self._priorities[match.lexeme.text]
@@ -95,24 +107,41 @@ class PostfixProcessor(object):
             self._operator_stack.pop()
 
     def _add_mark(self):
-        mark_name = 'mark_%s' % len(self._marks)
-        vars()[mark_name] = PostfixMark(mark_name)
-        self._marks[eval(mark_name)] = None
-        return eval(mark_name)
+        mark = PostfixMark('mark_%s' % len(self._marks))
+        self._marks[mark] = None
+        return mark
+
+    def _start_history(self, history_writer):
+        self._history_writer = history_writer
+        self._history_row = None
+        self._history_step = 0
+        self._dif_output = []
+        if history_writer is not None:
+            history_writer.writerow(['step', 'enter', 'stack', 'output'])
+
+    def _add_history_row(self, enter):
+        if self._history_row is not None:
+            self._history_writer.writerow(self._history_row)
+        stack_string = ', '.join([str(element) for element in self._operator_stack])
+        output_string = ', '.join([str(element) for element in self._dif_output])
+        self._history_row = [self._history_step, str(enter), stack_string, output_string]
+        self._history_step += 1
+        self._dif_output = []
 
-    @staticmethod
-    def _get_printable_postfix_history(postfix_history):
-        table = [['step', 'enter', 'stack', 'output']]
-        for i, [enter, stack, output] in enumerate(postfix_history):
-            stack_string = ', '.join([str(element) for element in stack])
-            output_string = ', '.join([str(element) for element in output])
-            table.append([i, str(enter), stack_string, output_string])
-        return table
-
-    def get_postfix_matches(self, infix_ordered):
+    def _finish_history(self, final_output):
+        if self._history_row is not None:
+            if final_output is not None:
+                self._history_row[2] = ''
+                self._history_row[3] = ', '.join([str(element) for element in final_output])
+            self._history_writer.writerow(self._history_row)
+        self._history_writer = None
+        self._history_row = None
+        self._dif_output = []
+
+    def get_postfix_matches(self, infix_ordered, history_writer=None):
         self._reinitialize()
+        self._start_history(history_writer)
 
-        postfix_history = []
         for i, current_match in enumerate(infix_ordered):
             if current_match.name in {'constant', 'identifier'}:
                 self.add_to_output(current_match)
@@ -175,7 +204,7 @@ class PostfixProcessor(object):
                 self._move_higher_priority_operators_to_output(baseline_priority)
 
             else:
-                unary_operators = {'-': '@', '+': '+_'}
+                unary_operators = self.unary_operators
                 if current_match.lexeme.text in unary_operators.keys():
                     previous_match = infix_ordered[i-1]
                     if not (previous_match.lexeme.lex_type in ['constant', 'identifier']) \
@@ -186,22 +215,235 @@ class PostfixProcessor(object):
                 baseline_priority = self._get_priority(current_match)
                 self._move_higher_priority_operators_to_output(baseline_priority)
                 self._operator_stack.append(current_match)
-            postfix_history.append([current_match, copy(self._operator_stack), self._dif_output])
-            self._dif_output = []
+            if self._history_writer is not None:
+                self._add_history_row(current_match)
 
+        final_output = None
         if self._operator_stack:
+            final_output = []
             for operator in list(reversed(self._operator_stack)):
                 if type(operator) == PostfixMark:
                     self._marks[operator] = len(self._output)
                 else:
-                    self._dif_output.append(operator)
+                    final_output.append(operator)
                     self._output.append(operator)
-            postfix_history[-1][1] = []
-            postfix_history[-1][2] = self._dif_output
+        if self._history_writer is not None:
+            self._finish_history(final_output)
         postfix_matches = self._output
         marks = self._marks
         self._reinitialize()
-        return postfix_matches, marks, self._get_printable_postfix_history(postfix_history)
+        return postfix_matches, marks, None
+
+
+class _ExpressionError(Exception):
+    def __init__(self, position):
+        super(_ExpressionError, self).__init__(position)
+        self.position = position
+
+
+class ExpressionProcessor(object):
+    def __init__(self, syntax_analyzer):
+        self._priorities = get_priorities(PostfixProcessor.operators_ordering)
+        self._unary_operators = PostfixProcessor.unary_operators
+        self._operand_symbols = {name: syntax_analyzer.get_symbol(name) for name in ['constant', 'identifier']}
+        self._unary_symbol = syntax_analyzer.get_symbol('low_priority_math_operator')
+        self._binary_symbols = dict()
+        for name in ['comparison_operator', 'low_priority_math_operator', 'high_priority_math_operator']:
+            symbol = syntax_analyzer.get_symbol(name)
+            for text in symbol.possible_children:
+                self._binary_symbols[text] = symbol
+
+    def get_postfix_matches(self, lexemes, position=0, output=None):
+        if output is None:
+            output = []
+        try:
+            position = self._parse_expression(lexemes, position, output)
+        except _ExpressionError as error:
+            return None, error.position
+        return output, position
+
+    def _parse_expression(self, lexemes, position, output):
+        length = len(lexemes)
+        operators = []
+        depth = 0
+        while True:
+            while position < length and lexemes[position].text == '(':
+                operators.append(None)
+                depth += 1
+                position += 1
+            position = self._parse_factor(lexemes, position, output)
+            while True:
+                lexeme = lexemes[position] if position < length else None
+                symbol = None if lexeme is None else self._binary_symbols.get(lexeme.text)
+                if symbol is not None:
+                    priority = self._priorities[lexeme.text]
+                    while operators and operators[-1] is not None and operators[-1][2] >= priority:
+                        output.append(TerminalMatch(*operators.pop()[:2]))
+                    operators.append((symbol, lexeme, priority))
+                    position += 1
+                    break
+                while operators and operators[-1] is not None:
+                    output.append(TerminalMatch(*operators.pop()[:2]))
+                if not depth:
+                    return position
+                if lexeme is None or lexeme.text != ')':
+                    raise _ExpressionError(position)
+                operators.pop()
+                depth -= 1
+                position += 1
+
+    def _parse_factor(self, lexemes, position, output):
+        if position >= len(lexemes):
+            raise _ExpressionError(position)
+        lexeme = lexemes[position]
+        if lexeme.lex_type in self._operand_symbols:
+            output.append(TerminalMatch(self._operand_symbols[lexeme.lex_type], lexeme))
+            return position + 1
+        if lexeme.text in self._unary_operators:
+            if position + 1 >= len(lexemes) or lexemes[position + 1].lex_type not in self._operand_symbols:
+                raise _ExpressionError(position + 1)
+            operand = lexemes[position + 1]
+            output.append(TerminalMatch(self._operand_symbols[operand.lex_type], operand))
+            lexeme.text = self._unary_operators[lexeme.text]
+            output.append(TerminalMatch(self._unary_symbol, lexeme))
+            return position + 2
+        raise _ExpressionError(position)
+
+
+class SyntaxDirectedTranslator(object):
+    def __init__(self, syntax_analyzer):
+        self._expression_processor = ExpressionProcessor(syntax_analyzer)
+        self._identifier_symbol = syntax_analyzer.get_symbol('identifier')
+        self._assignment_symbol = syntax_analyzer.get_symbol('assignment_operator')
+        self._write_symbol = SimpleSymbol('write')
+        self._read_symbol = SimpleSymbol('read')
+        self._binary_operators = {value: key for key, value in PostfixProcessor.unary_operators.items()}
+        self._statement_parsers = {
+            'write': self._parse_output_statement,
+            'read': self._parse_input_statement,
+        }
+        self._block_statement_parsers = {
+            'if': self._parse_conditional_statement,
+            'while': self._parse_iteration_statement,
+        }
+
+    def get_postfix_matches(self, lexemes):
+        output = []
+        marks = dict()
+        try:
+            position = self._parse_statement_list(lexemes, 0, output, marks)
+            if position == 0 or position < len(lexemes):
+                raise _ExpressionError(position)
+        except _ExpressionError as error:
+            for match in output:
+                if type(match) == TerminalMatch and match.lexeme.text in self._binary_operators:
+                    match.lexeme.text = self._binary_operators[match.lexeme.text]
+            return None, error.position
+        return output, marks
+
+    @staticmethod
+    def _add_mark(marks):
+        mark = PostfixMark('mark_%s' % len(marks))
+        marks[mark] = None
+        return mark
+
+    @staticmethod
+    def _set_mark(marks, mark, position):
+        mark.start_position = position
+        marks[mark] = position
+
+    @staticmethod
+    def _expect(lexemes, position, text):
+        if position >= len(lexemes) or lexemes[position].text != text:
+            raise _ExpressionError(position)
+        return position + 1
+
+    @staticmethod
+    def _expect_identifier(lexemes, position):
+        if position >= len(lexemes) or lexemes[position].lex_type != 'identifier':
+            raise _ExpressionError(position)
+        return position + 1
+
+    def _parse_expression(self, lexemes, position, output):
+        postfix, position = self._expression_processor.get_postfix_matches(lexemes, position, output)
+        if postfix is None:
+            raise _ExpressionError(position)
+        return position
+
+    def _parse_statement_list(self, lexemes, position, output, marks):
+        length = len(lexemes)
+        blocks = []
+        while True:
+            lexeme = lexemes[position] if position < length else None
+            if lexeme is not None and lexeme.lex_type == 'identifier':
+                position = self._parse_assignment_statement(lexemes, position, output, marks)
+            elif lexeme is not None and lexeme.text in self._statement_parsers:
+                position = self._statement_parsers[lexeme.text](lexemes, position, output, marks)
+            elif lexeme is not None and lexeme.text in self._block_statement_parsers:
+                blocks.append(self._block_statement_parsers[lexeme.text](lexemes, position, output, marks))
+                position = next(blocks[-1])
+                continue
+            elif blocks:
+                try:
+                    position = blocks[-1].send(position)
+                    continue
+                except StopIteration as stop:
+                    blocks.pop()
+                    position = stop.value
+            else:
+                return position
+            position = self._expect(lexemes, position, ';')
+
+    def _parse_assignment_statement(self, lexemes, position, output, marks):
+        output.append(TerminalMatch(self._identifier_symbol, lexemes[position]))
+        position = self._expect(lexemes, position + 1, '=')
+        assignment_lexeme = lexemes[position - 1]
+        position = self._parse_expression(lexemes, position, output)
+        output.append(TerminalMatch(self._assignment_symbol, assignment_lexeme))
+        return position
+
+    def _parse_output_statement(self, lexemes, position, output, marks):
+        write_lexeme = lexemes[position]
+        position = self._parse_expression(lexemes, position + 1, output)
+        output.append(TerminalMatch(self._write_symbol, write_lexeme))
+        return position
+
+    def _parse_input_statement(self, lexemes, position, output, marks):
+        read_lexeme = lexemes[position]
+        position = self._expect_identifier(lexemes, position + 1)
+        output.append(TerminalMatch(self._identifier_symbol, lexemes[position - 1]))
+        output.append(TerminalMatch(self._read_symbol, read_lexeme))
+        return position
+
+    def _parse_conditional_statement(self, lexemes, position, output, marks):
+        position = self._parse_expression(lexemes, position + 1, output)
+        position = self._expect(lexemes, position, 'then')
+        false_mark = self._add_mark(marks)
+        output.extend([false_mark, PostfixJump(name='jump_on_False', mark=false_mark)])
+        position = yield self._expect(lexemes, position, '{')
+        position = self._expect(lexemes, position, '}')
+        position = self._expect(lexemes, position, 'else')
+        exit_mark = self._add_mark(marks)
+        output.extend([exit_mark, PostfixJump(name='jump', mark=exit_mark)])
+        self._set_mark(marks, false_mark, len(output))
+        position = yield self._expect(lexemes, position, '{')
+        position = self._expect(lexemes, position, '}')
+        self._set_mark(marks, exit_mark, len(output))
+        return position
+
+    def _parse_iteration_statement(self, lexemes, position, output, marks):
+        loop_mark = self._add_mark(marks)
+        self._set_mark(marks, loop_mark, len(output))
+        position = self._parse_expression(lexemes, position + 1, output)
+        position = self._expect(lexemes, position, 'do')
+        false_mark = self._add_mark(marks)
+        output.extend([false_mark, PostfixJump(name='jump_on_False', mark=false_mark)])
+        position = yield self._expect(lexemes, position, '{')
+        position = self._expect(lexemes, position, '}')
+        position = self._expect(lexemes, position, 'enddo')
+        output.extend([loop_mark, PostfixJump(name='jump', mark=loop_mark)])
+        self._set_mark(marks, false_mark, len(output))
+        return position
 
 
 class ConstantOperand(object):
@@ -231,39 +473,83 @@ class IdentifierOperand(object):
         return None
 
 
+def power(a, b):
+    value = a ** b
+    if type(value) == complex:
+        raise ValueError('Complex result')
+    return value
+
+
+operator_functions = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '^': power,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+}
+
+value_error_messages = {
+    ZeroDivisionError: 'Zero Division',
+    OverflowError: 'Overflow',
+    ValueError: 'Math Domain',
+    TypeError: 'Unsupported Operands',
+}
+
+value_errors = tuple(value_error_messages)
+
+temporary_prefix = '$'
+
+
+def is_source_constant(match):
+    return match.symbol.name == 'constant' and not match.lexeme.folded
+
+
+def get_operator_value(operator_text, a_value, b_value):
+    return operator_functions[operator_text](a_value, b_value)
+
+
 class PostfixExecutor(object):
-    def __init__(self):
+    def __init__(self, input_provider=None):
+        self.input_provider = input_provider
         self.variables = dict()
+        self.temporaries = dict()
         self.operands = list()
         self.postfix = list()
 
+    def _get_scope(self, identifier):
+        if identifier.startswith(temporary_prefix):
+            return self.temporaries
+        return self.variables
+
     def _get_operator(self, match):
         operator_str = match.lexeme.text
 
         if hasattr(self, '_%s' % match.symbol.name):
             return getattr(self, '_%s' % match.symbol.name)
 
-        if operator_str == '^':
-            operator_str = '**'
-        if operator_str == '@':
-            operator_str = '-'
-
         def operator(a, b):
-            if type(a) == IdentifierOperand:
-                if a.value is None:
-                    return a.lexeme
-            elif type(b) == IdentifierOperand:
-                if b.value is None:
-                    return b.lexeme
+            if type(a) == IdentifierOperand and a.value is None:
+                return a.lexeme
+            if type(b) == IdentifierOperand and b.value is None:
+                return b.lexeme
             if operator_str == '/' and b.value == 0:
                 return ZeroDivisionError, match.lexeme
-            code_str = ' '.join([str(item) for item in [a.value, operator_str, b.value]])
-            return ConstantOperand(eval(code_str))
+            try:
+                return ConstantOperand(get_operator_value(operator_str, a.value, b.value))
+            except value_errors as error:
+                return type(error), match.lexeme
 
         return operator
 
     def _assignment_operator(self, variable_name, operand):
-        self.variables[variable_name.identifier] = operand.value
+        self._get_scope(variable_name.identifier)[variable_name.identifier] = operand.value
 
     def get_output(self, postfix_ordered, file=None, output_function=None, value=None, start_position=0):
         if not(value is None):
@@ -277,20 +563,33 @@ class PostfixExecutor(object):
                 break
             match = postfix_ordered[start_position]
             if type(match) == TerminalMatch:
-                lexeme_value = match.lexeme.value
                 if match.symbol.name == 'constant':
-                    self.operands.append(ConstantOperand(lexeme_value))
+                    self.operands.append(ConstantOperand(match.lexeme.value))
                 elif match.symbol.name == 'identifier':
-                    self.operands.append(IdentifierOperand(match.lexeme, self.variables))
+                    self.operands.append(IdentifierOperand(match.lexeme, self._get_scope(match.lexeme.text)))
                 elif match.symbol.name == 'write':
                     match = postfix_ordered[start_position-1]
                     if match.symbol.name == 'identifier':
-                        output_function(self.variables[match.lexeme.text])
-                    elif match.symbol.name == 'constant':
+                        output_function(self._get_scope(match.lexeme.text)[match.lexeme.text])
+                    elif is_source_constant(match):
                         output_function(match.lexeme.text)
                     else:
                         output_function(self.operands.pop().value)
                 elif match.symbol.name == 'read':
+                    if self.input_provider is not None:
+                        try:
+                            value = self.input_provider.get_value(start_position + 1)
+                        except (EOFError, ValueError) as input_error:
+                            message = "No input value" if isinstance(input_error, EOFError) else "Invalid input value"
+                            error = AnalysisError(file=file,
+                                                  error_type="Input Error",
+                                                  lexeme=match.lexeme,
+                                                  message=message)
+                            output_function('\n' + str(error))
+                            break
+                        self._assignment_operator(self.operands.pop(), ConstantOperand(value))
+                        start_position += 1
+                        continue
                     output_function(mode='input', next_compiler_position=start_position+1)
                     text_reading = True
                     break
@@ -314,7 +613,7 @@ class PostfixExecutor(object):
                         error = AnalysisError(file=file,
                                               error_type="Value Error",
                                               lexeme=result[1],
-                                              message="Zero Division")
+                                              message=value_error_messages[result[0]])
                         output_function('\n' + str(error))
                         break
                     if result:
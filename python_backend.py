@@ -0,0 +1,438 @@
+import cmath
+from bytecode import ExecutionError, ResumableExecutor, get_assignment_targets
+from postfix_transformation import PostfixMark, PostfixJump, operator_functions, temporary_prefix, is_source_constant, \
+    value_error_messages, value_errors
+
+python_operators = {
+    '+': '+',
+    '-': '-',
+    '*': '*',
+    '/': '/',
+    '==': '==',
+    '!=': '!=',
+    '<>': '!=',
+    '>': '>',
+    '<': '<',
+    '>=': '>=',
+    '<=': '<=',
+}
+
+program_file_name = '<program>'
+
+max_indent = 90
+max_expression_depth = 50
+
+module_power = '''def _power(a, b):
+    value = a ** b
+    if type(value) == complex:
+        raise ValueError('Complex result')
+    return value
+
+
+'''
+
+module_main = '''
+
+if __name__ == '__main__':
+    steps = program(dict(), print)
+    if hasattr(steps, 'send'):
+        try:
+            next(steps)
+            while True:
+                steps.send(float(input()))
+        except StopIteration:
+            pass
+'''
+
+
+def get_python_name(name):
+    if name.startswith(temporary_prefix):
+        return '_%s' % name[len(temporary_prefix):]
+    return 'v_%s' % name
+
+
+def get_python_constant(value):
+    if isinstance(value, (float, complex)) and not cmath.isfinite(value):
+        return "%s('%r')" % (type(value).__name__, value)
+    if repr(value).startswith('-'):
+        return '(%r)' % value
+    return repr(value)
+
+
+class _StructureError(Exception):
+    pass
+
+
+class _Item(object):
+    def __init__(self, kind, mark=None, name=None, source=None, elements=()):
+        self.kind = kind
+        self.mark = mark
+        self.name = name
+        self.source = source
+        self.elements = list(elements)
+
+
+class _Loop(object):
+    def __init__(self, continue_marks, break_marks):
+        self.continue_marks = continue_marks
+        self.break_marks = break_marks
+
+
+class PythonProgram(object):
+    def __init__(self, source, statements, structured=True, streaming_source=None, reads=()):
+        self.source = source
+        self.statements = statements
+        self.structured = structured
+        self.streaming_source = streaming_source
+        self.reads = list(reads)
+        self.code = compile(source, program_file_name, 'exec')
+        self._streaming_code = None
+
+    @property
+    def streaming_code(self):
+        if self._streaming_code is None:
+            self._streaming_code = compile(self.streaming_source, program_file_name, 'exec')
+        return self._streaming_code
+
+    def get_module(self):
+        return module_power + self.source + module_main
+
+
+class PythonGenerator(object):
+    def __init__(self):
+        self._label_indexes = None
+        self._spills = 0
+        self._reads = []
+        self._write_lines = []
+
+    def get_program(self, postfix_ordered):
+        self._spills = 0
+        self._reads = []
+        items = self._get_items(postfix_ordered)
+        self._label_indexes = {item.mark: index for index, item in enumerate(items) if item.kind == 'label'}
+        names = dict()
+        for item in items:
+            for element in item.elements:
+                if element.symbol.name == 'identifier':
+                    names[element.lexeme.text] = None
+            if item.kind in ('assign', 'read'):
+                names[item.name] = None
+        lines = ['def program(variables, write):']
+        for name in names:
+            if not name.startswith(temporary_prefix):
+                lines.append('    if %r in variables:' % name)
+                lines.append('        %s = variables[%r]' % (get_python_name(name), name))
+        try:
+            body, statements, self._write_lines = [], dict(), []
+            self._add_range(items, 0, len(items), None, frozenset(), 1, body, statements)
+            return self._get_program(lines, body, statements, True)
+        except (_StructureError, SyntaxError, RecursionError):
+            body, statements, self._write_lines = [], dict(), []
+            self._add_blocks(items, body, statements)
+            return self._get_program(lines, body, statements, False)
+
+    def _get_program(self, lines, body, statements, structured):
+        statements = {line + len(lines): elements for line, elements in statements.items()}
+        streaming_body = list(body)
+        for index, indent, source in self._write_lines:
+            streaming_body[index] = '    ' * indent + "yield 'output', %s" % source
+        source, streaming_source = ['\n'.join(lines + lines_body + ['    return locals()']) + '\n'
+                                    for lines_body in (body, streaming_body)]
+        return PythonProgram(source, statements, structured, streaming_source, self._reads)
+
+    def _spill(self, items, operands, index):
+        source, elements, depth, spillable = operands[index]
+        if spillable:
+            name = '_e%s' % self._spills
+            self._spills += 1
+            items.append(_Item('spill', name=name, source=source, elements=elements))
+            operands[index] = (name, elements, 0, False)
+
+    def _push(self, items, operands, operand):
+        operands.append(operand)
+        if operand[2] > max_expression_depth:
+            for index in range(len(operands)):
+                self._spill(items, operands, index)
+
+    def _get_items(self, postfix_ordered):
+        labels = dict()
+        for element in postfix_ordered:
+            if type(element) == PostfixJump and element.mark not in labels:
+                if element.mark.start_position is None:
+                    raise ValueError('Mark %s has no position' % element.mark)
+                labels[element.mark] = element.mark.start_position
+        targets = set(get_assignment_targets(postfix_ordered).values())
+        items = []
+        operands = []
+        for position in range(len(postfix_ordered) + 1):
+            items.extend(_Item('label', mark=mark) for mark, start in labels.items() if start == position)
+            if position == len(postfix_ordered):
+                break
+            element = postfix_ordered[position]
+            if type(element) == PostfixMark:
+                continue
+            if type(element) == PostfixJump:
+                if element.name == 'jump':
+                    items.append(_Item('jump', mark=element.mark))
+                else:
+                    source, elements = operands.pop()[:2]
+                    items.append(_Item('branch', mark=element.mark, source=source, elements=elements))
+                continue
+            name = element.symbol.name
+            text = element.lexeme.text
+            if name == 'constant':
+                operands.append((get_python_constant(element.lexeme.value), [element], 0, False))
+            elif name == 'identifier':
+                operands.append((get_python_name(text), [element], 0, position not in targets))
+            elif name == 'assignment_operator':
+                source, elements = operands.pop()[:2]
+                target = operands.pop()[1][0]
+                items.append(_Item('assign', name=target.lexeme.text, source=source, elements=elements))
+            elif name == 'read':
+                target = operands.pop()[1][0]
+                self._reads.append(element.lexeme)
+                items.append(_Item('read', name=target.lexeme.text, source=str(len(self._reads))))
+            elif name == 'write':
+                source, elements = operands.pop()[:2]
+                if is_source_constant(elements[-1]):
+                    source = repr(elements[-1].lexeme.text)
+                items.append(_Item('write', source=source, elements=elements))
+            elif text == '@':
+                source, elements, depth = operands.pop()[:3]
+                self._push(items, operands, ('(-%s)' % source, elements + [element], depth + 1, True))
+            elif text == '+_':
+                source, elements, depth = operands.pop()[:3]
+                operands.append((source, elements + [element], depth, True))
+            else:
+                b_source, b_elements, b_depth = operands.pop()[:3]
+                a_source, a_elements, a_depth = operands.pop()[:3]
+                if text == '^':
+                    source = '_power(%s, %s)' % (a_source, b_source)
+                else:
+                    source = '(%s %s %s)' % (a_source, python_operators[text], b_source)
+                self._push(items, operands, (source, a_elements + b_elements + [element], max(a_depth, b_depth) + 1,
+                                             True))
+        if operands:
+            raise ValueError('Postfix leaves %s unused operands' % len(operands))
+        return items
+
+    @staticmethod
+    def _add_line(lines, indent, text, statements=None, elements=None):
+        lines.append('    ' * indent + text)
+        if statements is not None:
+            statements[len(lines)] = elements
+
+    def _add_statement(self, item, indent, lines, statements):
+        if item.kind == 'assign':
+            self._add_line(lines, indent, '%s = %s' % (get_python_name(item.name), item.source),
+                           statements, item.elements)
+        elif item.kind == 'write':
+            self._write_lines.append((len(lines), indent, item.source))
+            self._add_line(lines, indent, 'write(%s)' % item.source, statements, item.elements)
+        elif item.kind == 'spill':
+            self._add_line(lines, indent, '%s = %s' % (item.name, item.source), statements, item.elements)
+        else:
+            self._add_line(lines, indent, "%s = yield 'input', %s" % (get_python_name(item.name), item.source))
+
+    def _get_chain(self, items, index, end=None, follow=frozenset()):
+        marks = set()
+        while index < len(items):
+            if index == end:
+                marks |= follow
+                break
+            item = items[index]
+            if item.kind == 'label':
+                marks.add(item.mark)
+                index += 1
+            elif item.kind == 'jump' and item.mark not in marks:
+                index = self._label_indexes[item.mark]
+            else:
+                break
+        return marks
+
+    def _add_range(self, items, start, end, loop, follow, indent, lines, statements):
+        if indent > max_indent:
+            raise _StructureError()
+        length = len(lines)
+        index = start
+        while index < end:
+            item = items[index]
+            if item.kind == 'label':
+                index = self._add_loop(items, index, end, follow, indent, lines, statements)
+            elif item.kind == 'branch':
+                index = self._add_branch(items, index, end, loop, follow, indent, lines, statements)
+            elif item.kind == 'jump':
+                if item.mark not in follow or any(items[position].kind != 'label' for position in range(index + 1, end)):
+                    self._add_line(lines, indent, self._get_loop_jump(item, loop))
+                index += 1
+            else:
+                self._add_statement(item, indent, lines, statements)
+                index += 1
+        if len(lines) == length:
+            self._add_line(lines, indent, 'pass')
+
+    @staticmethod
+    def _get_loop_jump(item, loop):
+        if loop is not None and item.mark in loop.continue_marks:
+            return 'continue'
+        if loop is not None and item.mark in loop.break_marks:
+            return 'break'
+        raise _StructureError(item.mark)
+
+    def _add_loop(self, items, index, end, follow, indent, lines, statements):
+        header_end = index
+        while header_end < end and items[header_end].kind == 'label':
+            header_end += 1
+        header_marks = {item.mark for item in items[index:header_end]}
+        back_indexes = [position for position in range(header_end, end)
+                        if items[position].kind in ('jump', 'branch') and items[position].mark in header_marks]
+        if not back_indexes:
+            return header_end
+        loop_end = back_indexes[-1]
+        continue_marks = self._get_chain(items, index)
+        position = loop_end
+        while items[position - 1].kind == 'label' and items[loop_end].kind == 'jump':
+            continue_marks.add(items[position - 1].mark)
+            position -= 1
+        loop = _Loop(continue_marks, self._get_chain(items, loop_end + 1, end, follow))
+        first = items[header_end] if header_end < loop_end else None
+        if first is not None and first.kind == 'branch' and first.mark in loop.break_marks:
+            self._add_line(lines, indent, 'while %s:' % first.source, statements, first.elements)
+            header_end += 1
+        else:
+            self._add_line(lines, indent, 'while True:')
+        self._add_range(items, header_end, loop_end, loop, continue_marks, indent + 1, lines, statements)
+        last = items[loop_end]
+        if last.kind == 'branch':
+            self._add_line(lines, indent + 1, 'if %s:' % last.source, statements, last.elements)
+            self._add_line(lines, indent + 2, 'break')
+        return loop_end + 1
+
+    def _get_exit_target(self, items, index, target, end, loop, follow):
+        if items[target - 1].kind != 'jump':
+            return target
+        exits = set()
+        for item in items[index + 1:target]:
+            if item.kind in ('jump', 'branch') and not index < self._label_indexes[item.mark] < target:
+                if loop is None or item.mark not in loop.continue_marks | loop.break_marks:
+                    exits.add(item.mark)
+        if not exits:
+            return target
+        if exits <= follow:
+            return end
+        exit_target = min(self._label_indexes[mark] for mark in exits)
+        if not target <= exit_target <= end or not exits <= self._get_chain(items, exit_target, end, follow):
+            raise _StructureError(items[index].mark)
+        return exit_target
+
+    def _add_branch(self, items, index, end, loop, follow, indent, lines, statements):
+        item = items[index]
+        if loop is not None and item.mark in loop.continue_marks | loop.break_marks:
+            self._add_line(lines, indent, 'if not %s:' % item.source, statements, item.elements)
+            self._add_line(lines, indent + 1, self._get_loop_jump(item, loop))
+            return index + 1
+        target = self._label_indexes[item.mark]
+        if item.mark in follow and not index < target <= end:
+            target = end
+        if not index < target <= end:
+            raise _StructureError(item.mark)
+        exit_target = self._get_exit_target(items, index, target, end, loop, follow)
+        exit_follow = self._get_chain(items, exit_target, end, follow)
+        self._add_line(lines, indent, 'if %s:' % item.source, statements, item.elements)
+        self._add_range(items, index + 1, target, loop, exit_follow, indent + 1, lines, statements)
+        if exit_target > target:
+            self._add_line(lines, indent, 'else:')
+            self._add_range(items, target, exit_target, loop, exit_follow, indent + 1, lines, statements)
+        return exit_target
+
+    def _add_blocks(self, items, lines, statements):
+        starts = {0}
+        for index, item in enumerate(items):
+            if item.kind == 'label':
+                starts.add(index)
+            elif item.kind in ('jump', 'branch'):
+                starts.add(index + 1)
+        starts = sorted(start for start in starts if start < len(items))
+        blocks = {start: number for number, start in enumerate(starts)}
+        self._add_line(lines, 1, 'label = 0')
+        self._add_line(lines, 1, 'while True:')
+        for number, start in enumerate(starts):
+            self._add_line(lines, 2, 'if label == %s:' % number)
+            index = start
+            while index < len(items) and (index == start or index not in blocks):
+                item = items[index]
+                if item.kind == 'jump':
+                    self._add_line(lines, 3, 'label = %s' % blocks[self._label_indexes[item.mark]])
+                    self._add_line(lines, 3, 'continue')
+                elif item.kind == 'branch':
+                    self._add_line(lines, 3, 'if not %s:' % item.source, statements, item.elements)
+                    self._add_line(lines, 4, 'label = %s' % blocks[self._label_indexes[item.mark]])
+                    self._add_line(lines, 4, 'continue')
+                elif item.kind != 'label':
+                    self._add_statement(item, 3, lines, statements)
+                index += 1
+            if items[index - 1].kind != 'jump' or index == start:
+                self._add_line(lines, 3, 'label = %s' % (number + 1))
+        self._add_line(lines, 2, 'break')
+
+
+class PythonExecutor(ResumableExecutor):
+    def get_read_lexeme(self, program, position):
+        return program.reads[position - 1]
+
+    def _store_variables(self, local_values):
+        for python_name, value in local_values.items():
+            if python_name.startswith('v_'):
+                self.variables[python_name[2:]] = value
+
+    def run(self, program, output_function=None):
+        self.program = program
+        namespace = {'_power': operator_functions['^']}
+        exec(program.code if output_function is not None else program.streaming_code, namespace)
+        try:
+            result = namespace['program'](dict(self.variables), output_function)
+            if hasattr(result, 'send'):
+                result = yield from result
+        except Exception as error:
+            frame, line = self._get_program_frame(error)
+            if frame is None:
+                raise
+            self._store_variables(dict(frame.f_locals))
+            if isinstance(error, (NameError,) + value_errors):
+                for error_line in (line, line + 1):
+                    execution_error = self._get_execution_error(frame.f_locals, error_line)
+                    if execution_error is not None:
+                        raise execution_error
+            raise
+        self._store_variables(result)
+
+    @staticmethod
+    def _get_program_frame(error):
+        frame, line = None, None
+        traceback = error.__traceback__
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == program_file_name:
+                frame, line = traceback.tb_frame, traceback.tb_lineno
+            traceback = traceback.tb_next
+        return frame, line
+
+    def _get_execution_error(self, local_values, line):
+        operands = []
+        for element in self.program.statements.get(line, ()):
+            name = element.symbol.name
+            text = element.lexeme.text
+            if name == 'constant':
+                operands.append(element.lexeme.value)
+            elif name == 'identifier':
+                if get_python_name(text) not in local_values:
+                    return ExecutionError('Name Error', element.lexeme, 'Undeclared identifier')
+                operands.append(local_values[get_python_name(text)])
+            elif text == '@':
+                operands[-1] = -operands[-1]
+            elif text != '+_':
+                b = operands.pop()
+                try:
+                    operands[-1] = operator_functions[text](operands[-1], b)
+                except value_errors as error:
+                    return ExecutionError('Value Error', element.lexeme, value_error_messages[type(error)])
+        return None
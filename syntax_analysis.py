@@ -1,11 +1,18 @@
 from utils import required
+import hashlib
+import json
+import os
 import re
-from common import type_regexes
+from array import array
+from collections import OrderedDict
+from common import type_regexes, terminal_lexemes, type_terminal_numbers
 
 
 class Symbol(object):
     def __init__(self, name=None):
         self._name = name
+        self.first_terminals = None
+        self.nullable = False
 
     @property
     def name(self):
@@ -20,7 +27,15 @@ class Symbol(object):
     def _get_default_name(self):
         raise NotImplementedError
 
-    def get_match(self, lexemes):
+    def get_match(self, lexemes, context):
+        raise NotImplementedError
+
+    def get_match_at(self, lexemes, position, context):
+        if context.memo is None:
+            return self._get_match_at(lexemes, position, context)
+        return context.memo.get_match_at(self, lexemes, position, context)
+
+    def _get_match_at(self, lexemes, position, context):
         raise NotImplementedError
 
     def __str__(self):
@@ -35,7 +50,7 @@ class RegexSymbol(Symbol):
         self.regex = re.compile(regex)
 
     """
-    def get_match(self, lexemes):
+    def get_match(self, lexemes, context):
         lexeme_index = self._get_lexeme_index(lexemes)
         if isinstance(lexeme_index, int):
             lexeme = lexemes[lexeme_index]
@@ -50,14 +65,22 @@ class RegexSymbol(Symbol):
             if not lexeme.matched:
                 return index
     """
-    def get_match(self, lexemes):
+    def get_match(self, lexemes, context):
         if lexemes:
             first_lexeme = lexemes[0]
             if self.name == first_lexeme.lex_type:
-                SyntaxAnalyzer.lexeme_position_from_tail = len(lexemes)
+                context.lexeme_position_from_tail = len(lexemes)
                 return TerminalMatch(self, first_lexeme), lexemes[1:]
         return None, lexemes
 
+    def get_match_at(self, lexemes, position, context):
+        if position < len(lexemes):
+            lexeme = lexemes[position]
+            if self.name == lexeme.lex_type:
+                context.lexeme_position_from_tail = len(lexemes) - position
+                return context.get_terminal_match(self, lexemes, position), position + 1
+        return None, position
+
     def _get_default_name(self):
         return str(self.regex)
 
@@ -65,10 +88,13 @@ class RegexSymbol(Symbol):
 class SimpleSymbol(Symbol):
     def __init__(self, children):
         super(SimpleSymbol, self).__init__()
+        self._default_name = str(children)
+        if isinstance(children, str):
+            children = {children}
         self.possible_children = children
 
     """
-    def get_match(self, lexemes):
+    def get_match(self, lexemes, context):
         lexeme_index = self._get_lexeme_index(lexemes)
         if isinstance(lexeme_index, int):
             lexeme = lexemes[lexeme_index]
@@ -84,28 +110,37 @@ class SimpleSymbol(Symbol):
                 return index
     """
 
-    def get_match(self, lexemes):
+    def get_match(self, lexemes, context):
         if lexemes:
             first_lexeme = lexemes[0]
             if first_lexeme.text in self.possible_children:
-                SyntaxAnalyzer.lexeme_position_from_tail = len(lexemes)
+                context.lexeme_position_from_tail = len(lexemes)
                 return TerminalMatch(self, first_lexeme), lexemes[1:]
         return None, lexemes
 
+    def get_match_at(self, lexemes, position, context):
+        if position < len(lexemes):
+            lexeme = lexemes[position]
+            if lexeme.text in self.possible_children:
+                context.lexeme_position_from_tail = len(lexemes) - position
+                return context.get_terminal_match(self, lexemes, position), position + 1
+        return None, position
+
     def _get_default_name(self):
-        return str(self.possible_children)
+        return self._default_name
 
 
 class IterativeSymbol(Symbol):
     def __init__(self, symbols):
         super(IterativeSymbol, self).__init__()
         self.symbols = symbols
+        self.lookahead_terminals = None
 
-    def get_match(self, lexemes):
+    def get_match(self, lexemes, context):
         symbol_matches = []
         updated_lexemes = lexemes
         while True:
-            current_matches, updated_lexemes = self._get_symbol_matches(updated_lexemes)
+            current_matches, updated_lexemes = self._get_symbol_matches(updated_lexemes, context)
             if current_matches:
                 symbol_matches += current_matches
             elif symbol_matches:
@@ -114,16 +149,77 @@ class IterativeSymbol(Symbol):
                 return EmptyMatch(self), lexemes
         return NonTerminalMatch(self, symbol_matches), updated_lexemes
 
-    def _get_symbol_matches(self, lexemes):
+    def _get_symbol_matches(self, lexemes, context):
         updated_lexemes = lexemes
         matches = []
         for symbol in self.symbols:
-            symbol_match, updated_lexemes = symbol.get_match(updated_lexemes)
+            symbol_match, updated_lexemes = symbol.get_match(updated_lexemes, context)
             if not symbol_match:
                 return None, lexemes
             matches.append(symbol_match)
         return matches, updated_lexemes
 
+    def _get_match_at(self, lexemes, position, context):
+        symbol_matches = []
+        updated_position = position
+        while True:
+            if not self._is_viable_at(lexemes, updated_position):
+                current_matches = None
+            else:
+                current_matches, updated_position = self._get_symbol_matches_at(lexemes, updated_position, context)
+            if current_matches:
+                symbol_matches += current_matches
+            elif symbol_matches:
+                break
+            else:
+                return context.get_empty_match(self), position
+        return context.get_non_terminal_match(self, symbol_matches), updated_position
+
+    def _get_symbol_matches_at(self, lexemes, position, context):
+        state = context.get_state()
+        updated_position = position
+        matches = []
+        for symbol in self.symbols:
+            symbol_match, updated_position = symbol.get_match_at(lexemes, updated_position, context)
+            if symbol_match is None:
+                context.restore_state(state)
+                return None, position
+            matches.append(symbol_match)
+        return matches, updated_position
+
+    def _iter_match_at(self, lexemes, position, context):
+        symbol_matches = []
+        updated_position = position
+        while True:
+            current_matches = None
+            if self._is_viable_at(lexemes, updated_position):
+                state = context.get_state()
+                round_matches = []
+                round_position = updated_position
+                for symbol in self.symbols:
+                    symbol_match, round_position = yield symbol, round_position
+                    if symbol_match is None:
+                        context.restore_state(state)
+                        break
+                    round_matches.append(symbol_match)
+                else:
+                    current_matches = round_matches
+                    updated_position = round_position
+            if current_matches:
+                symbol_matches += current_matches
+            elif symbol_matches:
+                break
+            else:
+                return context.get_empty_match(self), position
+        return context.get_non_terminal_match(self, symbol_matches), updated_position
+
+    def _is_viable_at(self, lexemes, position):
+        if self.lookahead_terminals is None:
+            return True
+        if position < len(lexemes):
+            return lexemes[position].terminal_number in self.lookahead_terminals
+        return False
+
     def _get_default_name(self):
         return str(self.symbols)
 
@@ -134,11 +230,13 @@ class CompositeSymbol(Symbol):
         if not children:
             children = []
         self.possible_children = children
+        self.lookahead_table = None
+        self.nullable_children = None
 
-    def get_match(self, lexemes):
+    def get_match(self, lexemes, context):
         matches = []
         for symbols in self.possible_children:
-            symbol_match, updated_lexemes = self._get_match_for_symbols(lexemes, symbols)
+            symbol_match, updated_lexemes = self._get_match_for_symbols(lexemes, symbols, context)
             if symbol_match:
                 matches.append((symbol_match, updated_lexemes))
         if not matches:
@@ -147,20 +245,519 @@ class CompositeSymbol(Symbol):
             return matches[0]
         raise ValueError('More than one match!')
 
-    def _get_match_for_symbols(self, lexemes, symbols):
+    def _get_match_for_symbols(self, lexemes, symbols, context):
         symbol_matches = []
         updated_lexemes = lexemes
         for symbol in symbols:
-            symbol_match, updated_lexemes = symbol.get_match(updated_lexemes)
+            symbol_match, updated_lexemes = symbol.get_match(updated_lexemes, context)
             if not symbol_match:
                 return None, lexemes
             symbol_matches.append(symbol_match)
         return NonTerminalMatch(self, symbol_matches), updated_lexemes
 
+    def _get_match_at(self, lexemes, position, context):
+        matches = []
+        for symbols in self._get_candidates_at(lexemes, position):
+            symbol_match, updated_position = self._get_match_at_for_symbols(lexemes, position, symbols, context)
+            if symbol_match is not None:
+                matches.append((symbol_match, updated_position))
+        if not matches:
+            return None, position
+        if len(matches) == 1:
+            return matches[0]
+        raise ValueError('More than one match!')
+
+    def _get_match_at_for_symbols(self, lexemes, position, symbols, context):
+        state = context.get_state()
+        symbol_matches = []
+        updated_position = position
+        for symbol in symbols:
+            symbol_match, updated_position = symbol.get_match_at(lexemes, updated_position, context)
+            if symbol_match is None:
+                context.restore_state(state)
+                return None, position
+            symbol_matches.append(symbol_match)
+        return context.get_non_terminal_match(self, symbol_matches), updated_position
+
+    def _iter_match_at(self, lexemes, position, context):
+        matches = []
+        for symbols in self._get_candidates_at(lexemes, position):
+            state = context.get_state()
+            symbol_matches = []
+            updated_position = position
+            for symbol in symbols:
+                symbol_match, updated_position = yield symbol, updated_position
+                if symbol_match is None:
+                    context.restore_state(state)
+                    break
+                symbol_matches.append(symbol_match)
+            else:
+                matches.append((context.get_non_terminal_match(self, symbol_matches), updated_position))
+        if not matches:
+            return None, position
+        if len(matches) == 1:
+            return matches[0]
+        raise ValueError('More than one match!')
+
+    def _get_candidates_at(self, lexemes, position):
+        if self.lookahead_table is None:
+            return self.possible_children
+        if position < len(lexemes):
+            return self.lookahead_table.get(lexemes[position].terminal_number, self.nullable_children)
+        return self.nullable_children
+
     def _get_default_name(self):
         return str(self.possible_children)
 
 
+class ParseContext(object):
+    def __init__(self, memo=None):
+        self.memo = memo
+        self.lexeme_position_from_tail = None
+
+    @staticmethod
+    def get_terminal_match(symbol, lexemes, position):
+        return TerminalMatch(symbol, lexemes[position])
+
+    @staticmethod
+    def get_non_terminal_match(symbol, children):
+        return NonTerminalMatch(symbol, children)
+
+    @staticmethod
+    def get_empty_match(symbol):
+        return EmptyMatch(symbol)
+
+    def reuse_match(self, match):
+        pass
+
+    def get_state(self):
+        return None
+
+    def restore_state(self, state):
+        pass
+
+    def get_result_match(self, match):
+        return match
+
+
+class ArenaParseContext(ParseContext):
+    def __init__(self, lexemes, memo=None):
+        super(ArenaParseContext, self).__init__(memo)
+        self.arena = ParseArena(lexemes)
+
+    def get_terminal_match(self, symbol, lexemes, position):
+        return self.arena.add_terminal(symbol, position)
+
+    def get_non_terminal_match(self, symbol, children):
+        return self.arena.add_non_terminal(symbol, children)
+
+    def get_empty_match(self, symbol):
+        return self.arena.add_empty(symbol)
+
+    def reuse_match(self, match):
+        if match is not None:
+            self.arena.terminal_nodes.extend(self.arena.iter_leaves(match))
+
+    def get_state(self):
+        return len(self.arena), len(self.arena.terminal_nodes)
+
+    def restore_state(self, state):
+        nodes_count, terminals_count = state
+        if self.memo is None:
+            self.arena.truncate(nodes_count)
+        del self.arena.terminal_nodes[terminals_count:]
+
+    def get_result_match(self, match):
+        if match is None:
+            return None
+        self.arena.root = match
+        return self.arena.get_match(match)
+
+
+class ParseArena(object):
+    unlinked = -2
+
+    def __init__(self, lexemes):
+        self.lexemes = lexemes
+        self.symbols = []
+        self._symbol_ids = dict()
+        self.node_symbols = array('H')
+        self.first_children = array('i')
+        self.next_siblings = array('i')
+        self.token_indexes = array('i')
+        self.terminal_nodes = array('I')
+        self.root = None
+
+    def __len__(self):
+        return len(self.node_symbols)
+
+    def _get_symbol_id(self, symbol):
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self._symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def _add_node(self, symbol_id, first_child=-1, token_index=-1):
+        self.node_symbols.append(symbol_id)
+        self.first_children.append(first_child)
+        self.next_siblings.append(self.unlinked)
+        self.token_indexes.append(token_index)
+        return len(self.node_symbols) - 1
+
+    def _get_unlinked(self, node):
+        if self.next_siblings[node] == self.unlinked:
+            return node
+        return self._add_node(self.node_symbols[node], self.first_children[node], self.token_indexes[node])
+
+    def add_terminal(self, symbol, token_index):
+        node = self._add_node(self._get_symbol_id(symbol), token_index=token_index)
+        self.terminal_nodes.append(node)
+        return node
+
+    def add_non_terminal(self, symbol, children):
+        children = [self._get_unlinked(child) for child in children]
+        for child, next_child in zip(children, children[1:]):
+            self.next_siblings[child] = next_child
+        self.next_siblings[children[-1]] = -1
+        return self._add_node(self._get_symbol_id(symbol), first_child=children[0])
+
+    def add_empty(self, symbol):
+        return self._add_node(self._get_symbol_id(symbol))
+
+    def truncate(self, nodes_count):
+        del self.node_symbols[nodes_count:]
+        del self.first_children[nodes_count:]
+        del self.next_siblings[nodes_count:]
+        del self.token_indexes[nodes_count:]
+
+    def get_symbol(self, node):
+        return self.symbols[self.node_symbols[node]]
+
+    def iter_children(self, node):
+        child = self.first_children[node]
+        while child >= 0:
+            yield child
+            child = self.next_siblings[child]
+
+    def iter_leaves(self, node):
+        if self.token_indexes[node] >= 0:
+            yield node
+            return
+        stack = []
+        child = self.first_children[node]
+        while child >= 0 or stack:
+            if child < 0:
+                child = stack.pop()
+            elif self.token_indexes[child] >= 0:
+                yield child
+                child = self.next_siblings[child]
+            else:
+                stack.append(self.next_siblings[child])
+                child = self.first_children[child]
+
+    def get_terminal_match(self, node):
+        return TerminalMatch(self.get_symbol(node), self.lexemes[self.token_indexes[node]])
+
+    def get_match(self, node):
+        if self.token_indexes[node] >= 0:
+            return self.get_terminal_match(node)
+        if self.first_children[node] < 0:
+            return EmptyMatch(self.get_symbol(node))
+        return ArenaMatch(self, node)
+
+
+class PackratMemo(object):
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_match_at(self, symbol, lexemes, position, context):
+        result = self.lookup(symbol, position, context)
+        if result is not None:
+            return result
+        previous_position_from_tail = self.enter(context)
+        result = symbol._get_match_at(lexemes, position, context)
+        self.store(symbol, position, result, context, previous_position_from_tail)
+        return result
+
+    def lookup(self, symbol, position, context):
+        key = (symbol, position)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        match, updated_position, position_from_tail = entry
+        context.reuse_match(match)
+        if position_from_tail is not None:
+            context.lexeme_position_from_tail = position_from_tail
+        return match, updated_position
+
+    @staticmethod
+    def enter(context):
+        previous_position_from_tail = context.lexeme_position_from_tail
+        context.lexeme_position_from_tail = None
+        return previous_position_from_tail
+
+    def store(self, symbol, position, result, context, previous_position_from_tail):
+        position_from_tail = context.lexeme_position_from_tail
+        if position_from_tail is None:
+            context.lexeme_position_from_tail = previous_position_from_tail
+        match, updated_position = result
+        self._entries[(symbol, position)] = (match, updated_position, position_from_tail)
+        if self.max_size is not None and len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+def get_match_without_recursion(symbol, lexemes, position, context):
+    memo = context.memo
+    stack = []
+    value = None
+    request = (symbol, position)
+    while True:
+        if request is not None:
+            symbol, position = request
+            request = None
+            if not isinstance(symbol, (CompositeSymbol, IterativeSymbol)):
+                value = symbol.get_match_at(lexemes, position, context)
+            else:
+                value = memo.lookup(symbol, position, context) if memo is not None else None
+                if value is None:
+                    previous_position_from_tail = memo.enter(context) if memo is not None else None
+                    stack.append((symbol._iter_match_at(lexemes, position, context), symbol, position,
+                                  previous_position_from_tail))
+        if not stack:
+            return value
+        generator, symbol, position, previous_position_from_tail = stack[-1]
+        try:
+            request = generator.send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+            if memo is not None:
+                memo.store(symbol, position, value, context, previous_position_from_tail)
+
+
+grammar_source = """
+# name : terminals <texts>  |  name : regex <type>  |  name ::= <alternatives>, where { ... } repeats a sequence
+comparison_operator : terminals == != > < >= <= <>
+low_priority_math_operator : terminals + -
+high_priority_math_operator : terminals * / ^
+opening_parenthesis : terminals (
+closing_parenthesis : terminals )
+statement_separator : terminals ;
+assignment_operator : terminals =
+opening_curly_brace : terminals {
+closing_curly_brace : terminals }
+constant : regex constant
+identifier : regex identifier
+low_priority_operator ::= comparison_operator | low_priority_math_operator
+expression ::= term iterative_symbol_for_expression_0
+iterative_symbol_for_expression_0 ::= { low_priority_operator term }
+term ::= factor { high_priority_math_operator factor }
+factor ::= constant | low_priority_math_operator constant | identifier | low_priority_math_operator identifier \
+    | opening_parenthesis expression closing_parenthesis
+assignment_statement ::= identifier assignment_operator expression
+statement ::= assignment_statement | output_statement | input_statement | conditional_statement | iteration_statement
+statement_list ::= { statement statement_separator }
+statement_list_in_braces ::= opening_curly_brace statement_list closing_curly_brace
+output_statement ::= 'write' expression
+input_statement ::= 'read' identifier
+conditional_statement ::= 'if' expression 'then' statement_list_in_braces 'else' statement_list_in_braces
+iteration_statement ::= 'while' expression 'do' statement_list_in_braces 'enddo'
+"""
+
+grammar_table_version = 1
+_grammar_token_regex = re.compile(r"'[^']*'|[{}|]|[^\s{}|']+")
+_grammar_tables = dict()
+
+
+def get_grammar_hash(source):
+    key = json.dumps([grammar_table_version, source, sorted(terminal_lexemes.items()),
+                      sorted(type_terminal_numbers.items()), sorted(type_regexes.items())])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+def _parse_grammar_rules(source):
+    rules = []
+    for line in source.replace('\\\n', ' ').split('\n'):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if '::=' in line:
+            name, body = line.split('::=', 1)
+            rules.append((name.strip(), 'sequences', _grammar_token_regex.findall(body)))
+        elif ':' in line:
+            name, body = line.split(':', 1)
+            body = body.split()
+            if not body or body[0] not in ('terminals', 'regex'):
+                raise ValueError('Unknown grammar rule: %s' % line)
+            rules.append((name.strip(), body[0], body[1:]))
+        else:
+            raise ValueError('Unknown grammar rule: %s' % line)
+    return rules
+
+
+def _compile_grammar_entries(source):
+    rules = _parse_grammar_rules(source)
+    rule_ids = dict()
+    for index, (name, _, _) in enumerate(rules):
+        if name in rule_ids:
+            raise ValueError('name=%s is repeated' % name)
+        rule_ids[name] = index
+    entries = [None] * len(rules)
+    literal_ids = dict()
+
+    def get_symbol_id(token):
+        if token.startswith("'"):
+            text = token[1:-1]
+            if text not in literal_ids:
+                literal_ids[text] = len(entries)
+                entries.append(['terminals', None, [text]])
+            return literal_ids[text]
+        if token not in rule_ids:
+            raise ValueError('Unknown grammar symbol: %s' % token)
+        return rule_ids[token]
+
+    def get_sequence(tokens, position):
+        sequence = []
+        while position < len(tokens) and tokens[position] not in ('|', '}'):
+            if tokens[position] == '{':
+                symbols, position = get_sequence(tokens, position + 1)
+                if position >= len(tokens) or tokens[position] != '}' or not symbols:
+                    raise ValueError('Wrong repetition in grammar: %s' % ' '.join(tokens))
+                sequence.append(len(entries))
+                entries.append(['iterative', None, symbols])
+            else:
+                sequence.append(get_symbol_id(tokens[position]))
+            position += 1
+        return sequence, position
+
+    for index, (name, kind, body) in enumerate(rules):
+        if kind == 'terminals':
+            entries[index] = ['terminals', name, body]
+        elif kind == 'regex':
+            if body != [name] or name not in type_regexes:
+                raise ValueError('Regex symbol must be named after its lexeme type: %s' % name)
+            entries[index] = ['regex', name, name]
+        elif body and body[0] == '{' and body[-1] == '}' and '{' not in body[1:] and '|' not in body:
+            entries[index] = ['iterative', name, get_sequence(body, 1)[0]]
+        else:
+            alternatives = []
+            position = 0
+            while True:
+                sequence, position = get_sequence(body, position)
+                if not sequence or (position < len(body) and body[position] != '|'):
+                    raise ValueError('Wrong grammar rule for %s: %s' % (name, ' '.join(body)))
+                alternatives.append(sequence)
+                if position == len(body):
+                    break
+                position += 1
+            entries[index] = ['composite', name, alternatives]
+    return entries
+
+
+def create_grammar_symbols(entries):
+    symbols = []
+    for kind, name, payload in entries:
+        if kind == 'terminals':
+            symbol = SimpleSymbol(set(payload) if name else payload[0])
+        elif kind == 'regex':
+            symbol = RegexSymbol(type_regexes[payload])
+        elif kind == 'iterative':
+            symbol = IterativeSymbol([])
+        else:
+            symbol = CompositeSymbol()
+        if name:
+            symbol.name = name
+        symbols.append(symbol)
+    for symbol, (kind, _, payload) in zip(symbols, entries):
+        if kind == 'iterative':
+            symbol.symbols.extend(symbols[index] for index in payload)
+        elif kind == 'composite':
+            for sequence in payload:
+                symbol.possible_children.append([symbols[index] for index in sequence])
+    return symbols
+
+
+def compile_grammar(source=grammar_source):
+    entries = _compile_grammar_entries(source)
+    symbols = create_grammar_symbols(entries)
+    symbol_dict = {name: symbol for symbol, (_, name, _) in zip(symbols, entries) if name}
+    lookahead_conflicts = SyntaxAnalyzer._build_lookahead_tables(symbol_dict)
+    lookahead = []
+    for symbol in symbols:
+        lookahead_terminals = None
+        lookahead_table = None
+        nullable_children = None
+        if isinstance(symbol, IterativeSymbol) and symbol.lookahead_terminals is not None:
+            lookahead_terminals = sorted(symbol.lookahead_terminals)
+        elif isinstance(symbol, CompositeSymbol):
+            indexes = {id(sequence): index for index, sequence in enumerate(symbol.possible_children)}
+            lookahead_table = {str(terminal_number): [indexes[id(sequence)] for sequence in candidates]
+                               for terminal_number, candidates in symbol.lookahead_table.items()}
+            nullable_children = [indexes[id(sequence)] for sequence in symbol.nullable_children]
+        lookahead.append([sorted(symbol.first_terminals), symbol.nullable, lookahead_terminals,
+                          lookahead_table, nullable_children])
+    return {
+        'version': grammar_table_version,
+        'hash': get_grammar_hash(source),
+        'symbols': entries,
+        'lookahead': lookahead,
+        'lookahead_conflicts': lookahead_conflicts,
+    }
+
+
+def get_grammar_table_path(source=grammar_source, cache_directory=None):
+    if cache_directory is None:
+        cache_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+    return os.path.join(cache_directory, 'grammar.%s.json' % get_grammar_hash(source))
+
+
+def write_grammar_table(table, path):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    temporary_path = '%s.%s.tmp' % (path, os.getpid())
+    with open(temporary_path, 'w') as file:
+        json.dump(table, file)
+    os.replace(temporary_path, path)
+
+
+def _read_grammar_table(path, grammar_hash):
+    try:
+        with open(path) as file:
+            table = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(table, dict) or table.get('hash') != grammar_hash:
+        return None
+    return table
+
+
+def get_grammar_table(source=grammar_source, cache_directory=None):
+    table = _grammar_tables.get(source)
+    if table is None:
+        grammar_hash = get_grammar_hash(source)
+        path = get_grammar_table_path(source, cache_directory)
+        table = _read_grammar_table(path, grammar_hash)
+        if table is None:
+            table = compile_grammar(source)
+            try:
+                write_grammar_table(table, path)
+            except OSError:
+                pass
+        _grammar_tables[source] = table
+    return table
+
+
 class Match(object):
     def __init__(self, symbol):
         required(symbol)
@@ -199,14 +796,44 @@ class NonTerminalMatch(Match):
         self.children = children
 
     def get_terminal_matches(self):
-        matches = []
-        for child in self.children:
-            matches.extend(child.get_terminal_matches())
-        return [m for m in matches if not isinstance(m, EmptyMatch)]
+        return [match for match in self._iter_leaves() if isinstance(match, TerminalMatch)]
 
     @property
     def text(self):
-        return ' '.join([child.text for child in self.children])
+        return ' '.join([match.text for match in self._iter_leaves()])
+
+    def _iter_leaves(self):
+        stack = [iter(self.children)]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+            elif isinstance(child, NonTerminalMatch) and child.children:
+                stack.append(iter(child.children))
+            else:
+                yield child
+
+
+class ArenaMatch(Match):
+    def __init__(self, arena, node):
+        super(ArenaMatch, self).__init__(arena.get_symbol(node))
+        self.arena = arena
+        self.node = node
+
+    @property
+    def children(self):
+        return [self.arena.get_match(child) for child in self.arena.iter_children(self.node)]
+
+    def get_terminal_matches(self):
+        if self.node == self.arena.root:
+            nodes = self.arena.terminal_nodes
+        else:
+            nodes = self.arena.iter_leaves(self.node)
+        return [self.arena.get_terminal_match(node) for node in nodes]
+
+    @property
+    def text(self):
+        return ' '.join([match.text for match in self.get_terminal_matches()])
 
 
 class TerminalMatch(Match):
@@ -223,94 +850,138 @@ class TerminalMatch(Match):
 
 
 class SyntaxAnalyzer(object):
-    lexeme_position_from_tail = None
-
-    def __init__(self):
-        self._symbol_dict = self._get_symbol_dict()
+    def __init__(self, engine='slicing', lookahead=False, packrat=False, memo_size=100000, arena=False):
+        if arena and engine == 'slicing':
+            raise ValueError('arena parse trees need the cursor or stack engine')
+        grammar_table = get_grammar_table()
+        self._symbol_dict = self._get_symbol_dict(grammar_table, lookahead)
         self._root = None
+        self.engine = engine
+        self.packrat = packrat
+        self.memo_size = memo_size
+        self.arena = arena
+        self.lookahead_conflicts = None
+        if lookahead:
+            self.lookahead_conflicts = grammar_table['lookahead_conflicts']
 
     def set_root(self, symbol_name):
         self._root = self._symbol_dict[symbol_name]
 
+    def get_symbol(self, symbol_name):
+        return self._symbol_dict[symbol_name]
+
     @staticmethod
-    def _get_symbol_dict():
-        comparison_operator = SimpleSymbol({'==', '!=', '>', '<', '>=', '<=', '<>'})
-        low_priority_math_operator = SimpleSymbol({'+', '-'})
-        high_priority_math_operator = SimpleSymbol({'*', '/', '^'})
-        low_priority_operator = CompositeSymbol([
-            [comparison_operator],
-            [low_priority_math_operator]
-        ])
-        opening_parenthesis = SimpleSymbol({'('})
-        closing_parenthesis = SimpleSymbol({')'})
-        statement_separator = SimpleSymbol({';'})
-        expression = CompositeSymbol()
-
-        constant = RegexSymbol(type_regexes['constant'])
-        identifier = RegexSymbol(type_regexes['identifier'])
-        assignment_operator = SimpleSymbol({'='})
-        assignment_statement = CompositeSymbol([[identifier, assignment_operator, expression]])
-        statement = CompositeSymbol([
-            [assignment_statement]
-        ])
-        statement_list = IterativeSymbol([statement, statement_separator])
-        opening_curly_brace = SimpleSymbol({'{'})
-        closing_curly_brace = SimpleSymbol({'}'})
-        statement_list_in_braces = CompositeSymbol([
-            [opening_curly_brace, statement_list, closing_curly_brace]
-        ])
-        output_statement = CompositeSymbol([[
-            SimpleSymbol('write'),
-            expression
-        ]])
-        input_statement = CompositeSymbol([[
-            SimpleSymbol('read'),
-            identifier
-        ]])
-        conditional_statement = CompositeSymbol([[
-            SimpleSymbol('if'),
-            expression,
-            SimpleSymbol('then'),
-            statement_list_in_braces,
-            SimpleSymbol('else'),
-            statement_list_in_braces
-        ]])
-        iteration_statement = CompositeSymbol([[
-            SimpleSymbol('while'),
-            expression,
-            SimpleSymbol('do'),
-            statement_list_in_braces,
-            SimpleSymbol('enddo'),
-        ]])
-        statement.possible_children.append([output_statement])
-        statement.possible_children.append([input_statement])
-        statement.possible_children.append([conditional_statement])
-        statement.possible_children.append([iteration_statement])
-        factor = CompositeSymbol([
-            [constant],
-            [low_priority_math_operator, constant],
-            [identifier],
-            [low_priority_math_operator, identifier],
-            [opening_parenthesis, expression, closing_parenthesis]
-        ])
-        term = CompositeSymbol([[factor, IterativeSymbol([high_priority_math_operator, factor])]])
-        iterative_symbol_for_expression_0 = IterativeSymbol([low_priority_operator, term])
-        expression.possible_children.append(
-            [term, iterative_symbol_for_expression_0])
-
-        symbol_names = dir()
-        symbol_dict = dict()
-        for name in symbol_names:
-            symbol = eval(name)
-            symbol.name = name
-            if name in symbol_dict:
-                raise ValueError('name=%s is repeated' % name)
-            symbol_dict[name] = symbol
+    def _get_symbol_dict(grammar_table, lookahead):
+        symbols = create_grammar_symbols(grammar_table['symbols'])
+        if lookahead:
+            for symbol, (first_terminals, nullable, lookahead_terminals, lookahead_table, nullable_children) \
+                    in zip(symbols, grammar_table['lookahead']):
+                symbol.first_terminals = set(first_terminals)
+                symbol.nullable = nullable
+                if isinstance(symbol, IterativeSymbol) and lookahead_terminals is not None:
+                    symbol.lookahead_terminals = frozenset(lookahead_terminals)
+                elif isinstance(symbol, CompositeSymbol):
+                    children = symbol.possible_children
+                    symbol.lookahead_table = {int(terminal_number): [children[index] for index in indexes]
+                                              for terminal_number, indexes in lookahead_table.items()}
+                    symbol.nullable_children = [children[index] for index in nullable_children]
+        return {symbol.name: symbol for symbol, (_, name, _) in zip(symbols, grammar_table['symbols']) if name}
+
+    @staticmethod
+    def _get_all_symbols(symbol_dict):
+        symbols = []
+        visited = set()
+        stack = list(symbol_dict.values())
+        while stack:
+            symbol = stack.pop()
+            if id(symbol) in visited:
+                continue
+            visited.add(id(symbol))
+            symbols.append(symbol)
+            if isinstance(symbol, CompositeSymbol):
+                for symbols_sequence in symbol.possible_children:
+                    stack.extend(symbols_sequence)
+            elif isinstance(symbol, IterativeSymbol):
+                stack.extend(symbol.symbols)
+        return symbols
 
-        return symbol_dict
+    @staticmethod
+    def _get_sequence_first(symbols):
+        first_terminals = set()
+        for symbol in symbols:
+            first_terminals |= symbol.first_terminals
+            if not symbol.nullable:
+                return first_terminals, False
+        return first_terminals, True
 
-    def get_match(self, lexemes):
-        match, updated_lexemes = self._root.get_match(lexemes)
+    @staticmethod
+    def _build_lookahead_tables(symbol_dict):
+        symbols = SyntaxAnalyzer._get_all_symbols(symbol_dict)
+        for symbol in symbols:
+            if isinstance(symbol, RegexSymbol):
+                symbol.first_terminals = {type_terminal_numbers[symbol.name]}
+            elif isinstance(symbol, SimpleSymbol):
+                symbol.first_terminals = {terminal_lexemes[text] for text in symbol.possible_children
+                                          if text in terminal_lexemes}
+            else:
+                symbol.first_terminals = set()
+
+        changed = True
+        while changed:
+            changed = False
+            for symbol in symbols:
+                if isinstance(symbol, IterativeSymbol):
+                    first_terminals, _ = SyntaxAnalyzer._get_sequence_first(symbol.symbols)
+                    nullable = True
+                elif isinstance(symbol, CompositeSymbol):
+                    first_terminals = set()
+                    nullable = False
+                    for symbols_sequence in symbol.possible_children:
+                        sequence_first, sequence_nullable = SyntaxAnalyzer._get_sequence_first(symbols_sequence)
+                        first_terminals |= sequence_first
+                        nullable = nullable or sequence_nullable
+                else:
+                    continue
+                if first_terminals != symbol.first_terminals or nullable != symbol.nullable:
+                    symbol.first_terminals = first_terminals
+                    symbol.nullable = nullable
+                    changed = True
+
+        terminal_names = {number: text for text, number in terminal_lexemes.items()}
+        terminal_names.update({number: name for name, number in type_terminal_numbers.items()})
+        conflicts = dict()
+        for symbol in symbols:
+            if isinstance(symbol, IterativeSymbol):
+                sequence_first, sequence_nullable = SyntaxAnalyzer._get_sequence_first(symbol.symbols)
+                if not sequence_nullable:
+                    symbol.lookahead_terminals = frozenset(sequence_first)
+            elif isinstance(symbol, CompositeSymbol):
+                sequences = [(symbols_sequence,) + SyntaxAnalyzer._get_sequence_first(symbols_sequence)
+                             for symbols_sequence in symbol.possible_children]
+                symbol.nullable_children = [symbols_sequence for symbols_sequence, _, sequence_nullable
+                                            in sequences if sequence_nullable]
+                symbol.lookahead_table = dict()
+                for terminal_number in symbol.first_terminals:
+                    candidates = [symbols_sequence for symbols_sequence, sequence_first, sequence_nullable
+                                  in sequences if sequence_nullable or terminal_number in sequence_first]
+                    symbol.lookahead_table[terminal_number] = candidates
+                    if len(candidates) > 1:
+                        conflicts.setdefault(symbol.name, set()).add(terminal_names[terminal_number])
+        return {name: sorted(terminals) for name, terminals in conflicts.items()}
+
+    def create_context(self, lexemes):
+        memo = PackratMemo(self.memo_size) if self.packrat else None
+        if self.arena:
+            return ArenaParseContext(lexemes, memo)
+        return ParseContext(memo)
+
+    def get_match(self, lexemes, root=None, context=None):
+        root = self._symbol_dict[root] if root else self._root
+        if context is None:
+            context = self.create_context(lexemes)
+        if self.engine in ('cursor', 'stack'):
+            return self._get_cursor_match(lexemes, root, context)
+        match, updated_lexemes = root.get_match(lexemes, context)
         """
         for lexeme in updated_lexemes:
             print(lexeme.text, lexeme.matched)
@@ -321,9 +992,24 @@ class SyntaxAnalyzer(object):
         return match
 
         """
-        if self.lexeme_position_from_tail != 1:
-            return lexemes[-self.lexeme_position_from_tail+1]
-        elif not match or isinstance(match, EmptyMatch) or updated_lexemes:
+        return self._get_result(lexemes, match, not updated_lexemes, context)
+
+    def _get_cursor_match(self, lexemes, root, context):
+        if self.engine == 'stack':
+            match, position = get_match_without_recursion(root, lexemes, 0, context)
+        else:
+            match, position = root.get_match_at(lexemes, 0, context)
+        match = context.get_result_match(match)
+        return self._get_result(lexemes, match, position == len(lexemes), context)
+
+    @staticmethod
+    def _get_result(lexemes, match, is_complete, context):
+        position_from_tail = context.lexeme_position_from_tail
+        if position_from_tail is None:
+            position_from_tail = len(lexemes) + 1
+        if position_from_tail != 1:
+            return lexemes[-position_from_tail+1]
+        elif not match or isinstance(match, EmptyMatch) or not is_complete:
             return None
         return match
 